@@ -0,0 +1,148 @@
+# analytics.py
+# Pre-aggregated activity time series. Every scored answer adds to small bucket documents:
+# one per (granularity, dimension, key, period), where granularity is day or week and the
+# dimension is the whole cohort (key "all"), the student, the interview role or the answer's
+# improvement_category. Coding runs are counted in the cohort and student buckets. Trend and heatmap queries then read a
+# few hundred bucket documents instead of scanning interview_results.
+
+import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+GRANULARITIES = ("day", "week")
+DIMENSIONS = ("cohort", "student", "role", "category")
+COHORT_KEY = "all"
+UNKNOWN_ROLE = "unknown"
+
+
+def period_start(timestamp, granularity):
+    """Start of the day, or of the ISO week (Monday), containing `timestamp`."""
+    day = datetime.datetime(timestamp.year, timestamp.month, timestamp.day)
+    return day - datetime.timedelta(days=day.weekday()) if granularity == "week" else day
+
+
+def bucket_key(granularity, dimension, key, start):
+    return {"granularity": granularity, "dimension": dimension, "key": key, "period_start": start}
+
+
+def answer_bucket_updates(result_doc, role):
+    """UpdateOne upserts folding one scored answer into its eight buckets."""
+    keys = {"cohort": COHORT_KEY, "student": result_doc['student_id'], "role": role or UNKNOWN_ROLE, "category": result_doc['improvement_category']}
+    return [
+        UpdateOne(
+            bucket_key(granularity, dimension, keys[dimension], period_start(result_doc['timestamp'], granularity)),
+            {"$inc": {"answers": 1, "score_sum": result_doc['score']}},
+            upsert=True,
+        )
+        for granularity in GRANULARITIES for dimension in DIMENSIONS
+    ]
+
+
+def coding_bucket_updates(activity_doc):
+    """UpdateOne upserts counting one coding run in the cohort's and the student's buckets."""
+    keys = {"cohort": COHORT_KEY, "student": activity_doc['student_id']}
+    return [
+        UpdateOne(
+            bucket_key(granularity, dimension, key, period_start(activity_doc['timestamp'], granularity)),
+            {"$inc": {"coding_runs": 1}},
+            upsert=True,
+        )
+        for granularity in GRANULARITIES for dimension, key in keys.items()
+    ]
+
+
+def ensure_bucket_indexes(buckets):
+    # The unique key doubles as the index for one series over a time range (trends).
+    buckets.create_index(
+        [("dimension", ASCENDING), ("granularity", ASCENDING), ("key", ASCENDING), ("period_start", ASCENDING)],
+        unique=True, name="series_period",
+    )
+    # Every series of a dimension over a time range (heatmaps).
+    buckets.create_index([("dimension", ASCENDING), ("granularity", ASCENDING), ("period_start", ASCENDING)], name="dimension_period")
+
+
+def compaction_pipelines(since, buckets_name):
+    """
+    Aggregations that recompute every bucket from `since` (a period start) onwards from
+    interview_results and coding_activity and $merge them over the existing buckets.
+    Returns (source, pipeline) pairs, where source is "interview_results" or "coding_activity".
+    """
+    pipelines = []
+    merge = {"$merge": {"into": buckets_name, "on": ["dimension", "granularity", "key", "period_start"], "whenMatched": "merge", "whenNotMatched": "insert"}}
+    for granularity in GRANULARITIES:
+        truncate = {"$dateTrunc": {"date": "$timestamp", "unit": granularity}}
+        if granularity == "week":
+            truncate["$dateTrunc"]["startOfWeek"] = "monday"
+        keys = {
+            "cohort": {"$literal": COHORT_KEY}, "student": "$student_id",
+            "role": {"$ifNull": ["$role", UNKNOWN_ROLE]}, "category": "$improvement_category",
+        }
+        for dimension, field in keys.items():
+            pipelines.append(("interview_results", [
+                {"$match": {"timestamp": {"$gte": since}}},
+                {"$group": {"_id": {"key": field, "period_start": truncate}, "answers": {"$sum": 1}, "score_sum": {"$sum": "$score"}}},
+                {"$project": {"_id": 0, "granularity": {"$literal": granularity}, "dimension": {"$literal": dimension},
+                              "key": "$_id.key", "period_start": "$_id.period_start", "answers": 1, "score_sum": 1}},
+                merge,
+            ]))
+        for dimension in ("cohort", "student"):
+            pipelines.append(("coding_activity", [
+                {"$match": {"timestamp": {"$gte": since}}},
+                {"$group": {"_id": {"key": keys[dimension], "period_start": truncate}, "coding_runs": {"$sum": 1}}},
+                {"$project": {"_id": 0, "granularity": {"$literal": granularity}, "dimension": {"$literal": dimension},
+                              "key": "$_id.key", "period_start": "$_id.period_start", "coding_runs": 1}},
+                merge,
+            ]))
+    return pipelines
+
+
+def period_range(granularity, periods, now):
+    """The start of each of the last `periods` periods, oldest first."""
+    step = datetime.timedelta(days=7 if granularity == "week" else 1)
+    last = period_start(now, granularity)
+    return [last - step * offset for offset in range(periods - 1, -1, -1)]
+
+
+def bucket_summary(bucket):
+    answers = bucket.get('answers', 0)
+    return {
+        "answers": answers,
+        "avg_score": round(bucket.get('score_sum', 0) / answers, 1) if answers else None,
+        "coding_runs": bucket.get('coding_runs', 0),
+    }
+
+
+def trend_series(buckets, dimension, key, granularity, periods, now):
+    """One point per period for one series: answers, average score and coding runs."""
+    starts = period_range(granularity, periods, now)
+    found = {
+        bucket['period_start']: bucket
+        for bucket in buckets.find(
+            {"dimension": dimension, "granularity": granularity, "key": key, "period_start": {"$gte": starts[0]}},
+            {"_id": 0, "period_start": 1, "answers": 1, "score_sum": 1, "coding_runs": 1},
+        )
+    }
+    return [dict(bucket_summary(found.get(start, {})), period=start.date().isoformat()) for start in starts]
+
+
+def heatmap(buckets, dimension, granularity, periods, now):
+    """Average score per (key, period) for every key of `dimension`, as a dense matrix."""
+    starts = period_range(granularity, periods, now)
+    index = {start: position for position, start in enumerate(starts)}
+    rows = {}
+    for bucket in buckets.find(
+        {"dimension": dimension, "granularity": granularity, "period_start": {"$gte": starts[0]}},
+        {"_id": 0, "key": 1, "period_start": 1, "answers": 1, "score_sum": 1},
+    ):
+        position = index.get(bucket['period_start'])
+        if position is None or not bucket.get('answers'):
+            continue
+        row = rows.setdefault(str(bucket['key']), [None] * len(starts))
+        row[position] = bucket_summary(bucket)
+    keys = sorted(rows)
+    return {
+        "periods": [start.date().isoformat() for start in starts],
+        "keys": keys,
+        "avg_score": [[cell and cell['avg_score'] for cell in rows[key]] for key in keys],
+        "answers": [[cell['answers'] if cell else 0 for cell in rows[key]] for key in keys],
+    }
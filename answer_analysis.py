@@ -0,0 +1,201 @@
+# answer_analysis.py
+# Pluggable scoring of interview answers. Every analyzer takes a question dict and the
+# student's answer and returns the analysis dict stored with the interview result:
+# {"score", "communication_feedback", "technical_feedback", "improvement_category"}.
+
+import os
+import re
+import random
+import functools
+import threading
+import concurrent.futures
+
+from interview_data import REMEDIAL_RESOURCES
+
+FILLER_WORDS = ("um", "uh", "erm", "like", "basically", "actually", "literally", "you know", "kind of", "sort of", "i mean")
+STOPWORDS = frozenset("""
+a an the and or but if then than so to of in on at by for with from into about as is are was were be been being
+do does did doing have has had this that these those it its what which who whom how why when where you your we our
+they their them he she his her i me my can could should would will shall may might must not no yes also there here
+describe explain walk through tell give example time difference between what's purpose specifically use using
+concept concepts discuss
+""".split())
+WORD_RE = re.compile(r"[a-z][a-z0-9+#\-]*")
+SENTENCE_RE = re.compile(r"[.!?]+")
+
+
+# ----------------------------------------------------
+# ANALYZERS (pluggable backends)
+# ----------------------------------------------------
+
+def _stem(word):
+    # Crude prefix stemming is enough to match "regression"/"regressions"/"regress".
+    return word[:6]
+
+
+@functools.lru_cache(maxsize=4096)
+def rubric_terms(question_text, concept, extra_terms=()):
+    """Key terms an answer is expected to cover: content words from the question plus the concept name."""
+    words = [w.strip("-") for w in WORD_RE.findall(question_text.lower())]
+    terms = {w for w in words if len(w) > 3 and w not in STOPWORDS}
+    terms.update(part for part in concept.lower().split("_") if len(part) > 2 and part not in ("skill", "hard", "easy"))
+    terms.update(t.lower() for t in extra_terms)
+    by_stem = {}
+    for term in sorted(terms):
+        by_stem.setdefault(_stem(term), term)
+    return tuple(sorted(by_stem.values()))
+
+
+class OfflineAnalyzer:
+    """
+    Heuristic scorer that needs no model: concept coverage against the question's rubric
+    terms (60%), answer depth (20%) and fluency, i.e. filler-word rate and sentence length
+    (20%). The weakest dimension picks the REMEDIAL_RESOURCES category.
+    """
+
+    def analyze(self, question, answer):
+        answer = answer or ""
+        text = answer.lower()
+        words = WORD_RE.findall(text)
+        terms = rubric_terms(question['text'], question['concept'], tuple(question.get('rubric', ())))
+
+        stems = {_stem(w) for w in words}
+        covered = [t for t in terms if _stem(t) in stems]
+        coverage = (len(covered) / len(terms) if terms else 1.0) if words else 0.0
+
+        padded = f" {' '.join(words)} "
+        fillers = sum(padded.count(f" {f} ") for f in FILLER_WORDS)
+        filler_rate = fillers / len(words) if words else 0.0
+        sentences = [s for s in SENTENCE_RE.split(answer) if s.strip()] or [answer]
+        avg_sentence = len(words) / len(sentences) if words else 0.0
+
+        depth = min(len(words) / 80, 1.0)
+        # An empty answer has no filler words, but is not fluent either.
+        fluency = max(0.0, 1.0 - filler_rate * 8) * (0.6 if avg_sentence > 35 else 1.0) if words else 0.0
+        score = round(100 * (0.6 * min(coverage * 1.5, 1.0) + 0.2 * depth + 0.2 * fluency))
+
+        return {
+            "score": score,
+            "communication_feedback": self._communication_feedback(len(words), fillers, avg_sentence),
+            "technical_feedback": self._technical_feedback(question['concept'], covered, terms),
+            "improvement_category": self._category(question, coverage, depth, filler_rate, avg_sentence),
+        }
+
+    @staticmethod
+    def _communication_feedback(word_count, fillers, avg_sentence):
+        if word_count < 25:
+            return f"Your answer was brief ({word_count} words). Expand with a concrete example and the outcome."
+        notes = []
+        if fillers:
+            notes.append(f"you used {fillers} filler word{'s' if fillers != 1 else ''}")
+        if avg_sentence > 35:
+            notes.append(f"sentences average {avg_sentence:.0f} words, so break them up")
+        if not notes:
+            return "Clear and well-paced delivery. Keep structuring answers as context, action, result."
+        return "Delivery: " + "; ".join(notes) + "."
+
+    @staticmethod
+    def _technical_feedback(concept, covered, terms):
+        missing = [t for t in terms if t not in covered]
+        if not terms:
+            return f"No rubric terms are defined for {concept}."
+        summary = f"Covered {len(covered)} of {len(terms)} key ideas for {concept}."
+        if missing:
+            summary += " Consider addressing: " + ", ".join(missing[:5]) + "."
+        return summary
+
+    @staticmethod
+    def _category(question, coverage, depth, filler_rate, avg_sentence):
+        concept = question['concept']
+        if filler_rate > 0.05:
+            return "filler_words"
+        if coverage < 0.5 and concept in REMEDIAL_RESOURCES:
+            return concept
+        if depth < 0.4 or avg_sentence > 35:
+            return "communication_star" if concept.startswith("skill_") else "communication_structure"
+        return concept if concept in REMEDIAL_RESOURCES else "communication_structure"
+
+
+class MockAnalyzer:
+    """The original demonstration scorer: random score and category."""
+
+    def analyze(self, question, answer):
+        concept_key = question['concept']
+        mock_score = random.randint(30, 95)
+        return {
+            "score": mock_score,
+            "communication_feedback": f"MOCK: Your structure needs polish. Focus on organizing thoughts for {concept_key}.",
+            "technical_feedback": f"MOCK: Concept {concept_key} explanation was {mock_score//10 * 10}% accurate.",
+            "improvement_category": random.choice(list(REMEDIAL_RESOURCES.keys())),
+        }
+
+
+ANALYZERS = {
+    "offline": OfflineAnalyzer,
+    "mock": MockAnalyzer,
+}
+
+
+def build_analyzer(name):
+    """Instantiates the analyzer registered under `name` (see ANALYZERS)."""
+    if name not in ANALYZERS:
+        raise ValueError(f"Unknown answer analyzer '{name}'. Choose one of: {', '.join(ANALYZERS)}")
+    return ANALYZERS[name]()
+
+
+# ----------------------------------------------------
+# ENGINE (batching, pool, timeout, fallback)
+# ----------------------------------------------------
+
+def _run_analyzer(analyzer, question, answer):
+    return analyzer.analyze(question, answer)
+
+
+class AnalysisEngine:
+    """
+    Scores answers on a thread or process pool. Any answer the primary analyzer cannot
+    score within `timeout` seconds (or that raises) is scored by `fallback` inline, so a
+    slow or failing backend never holds up the caller for longer than the timeout.
+    """
+
+    def __init__(self, analyzer, fallback=None, max_workers=4, timeout=3.0, use_processes=False):
+        self.analyzer = analyzer
+        self.fallback = fallback or OfflineAnalyzer()
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.use_processes = use_processes
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def _executor(self):
+        # Pools are per process; a forked worker builds its own on first use.
+        with self._lock:
+            if self._pid != os.getpid():
+                pool_class = concurrent.futures.ProcessPoolExecutor if self.use_processes else concurrent.futures.ThreadPoolExecutor
+                self._pool = pool_class(max_workers=self.max_workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def analyze(self, question, answer):
+        return self.analyze_batch([(question, answer)])[0]
+
+    def analyze_batch(self, items):
+        """Scores a list of (question, answer) pairs; returns results in the same order."""
+        pool = self._executor()
+        futures = [pool.submit(_run_analyzer, self.analyzer, dict(question), answer) for question, answer in items]
+        done, _ = concurrent.futures.wait(futures, timeout=self.timeout)
+
+        results = []
+        for future, (question, answer) in zip(futures, items):
+            result = None
+            if future in done and future.exception() is None:
+                result = future.result()
+            else:
+                future.cancel()
+                try:
+                    result = self.fallback.analyze(question, answer)
+                except Exception as e:
+                    print(f"!!! ANSWER ANALYSIS FAILED for {question.get('concept')}: {e} !!!")
+            results.append(result)
+        return results
@@ -1,40 +1,158 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from pymongo import MongoClient
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
+import click
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 from dotenv import load_dotenv
-from werkzeug.security import generate_password_hash, check_password_hash
 from bson.objectid import ObjectId
+from bson.errors import InvalidId
 import os
 import datetime
 import json
-import random
-import requests # Needed for Compiler
+import secrets
+from markupsafe import Markup
 
 # --- PHASE 9 IMPORTS: AI Logic and Customization ---
 from interview_data import (
-    INTERVIEW_QUESTIONS_BY_ROLE, REMEDIAL_RESOURCES, 
-    LEVEL_CATEGORIES, BRANCH_CATEGORIES, ROLE_CATEGORIES, 
-    PHASE_INTRODUCTION_Q, PHASE_SOFT_SKILL_Q
+    REMEDIAL_RESOURCES, 
+    LEVEL_CATEGORIES, BRANCH_CATEGORIES, ROLE_CATEGORIES
 )
+from config import load_config, mongo_client_options
+from database import MongoConnection
+from write_buffer import WriteBehindBuffer
+from dashboard_cache import DashboardCache
+from password_hashing import PasswordHasher, LoginThrottle, LoginRejected
+from instrumentation import Instrumentation
+from question_bank import QUESTION_BANK
+from mastery import apply_mastery, mastery_update_fields
+from recommender import RESOURCE_RECOMMENDER
+from interview_store import InMemoryInterviewStore, MongoInterviewStore, RedisInterviewStore
+from answer_analysis import AnalysisEngine, build_analyzer
+from scoring_pipeline import ScoringPipeline, ScoringRejected
+from analytics import (
+    COHORT_KEY, answer_bucket_updates, coding_bucket_updates, ensure_bucket_indexes,
+    compaction_pipelines, period_start, trend_series, heatmap,
+)
+from exports import EXPORT_FIELDS, export_rows, stream_csv, stream_jsonl
+from code_execution import ExecutionGateway, ExecutionRejected, ResultCache, MongoJobStore, build_executor
 
 # --- CONFIGURATION ---
 load_dotenv()
 app = Flask(__name__)
-app.secret_key = os.getenv('SECRET_KEY')  
+
+# Route latency, Mongo commands per request, template and compiler timings; served at /metrics.
+instrumentation = Instrumentation(slow_request_seconds=float(os.getenv('SLOW_REQUEST_SECONDS', 0.5)))
+instrumentation.init_app(app)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
 
 # --- MONGODB CONNECTION ---
-MONGO_URI = os.getenv('MONGO_URI')
-try:
-    client = MongoClient(MONGO_URI)
-    db = client.campus360db 
-except Exception as e:
-    print(f"!!! CRITICAL MONGODB CONNECTION FAILURE: {e} !!!")
-    exit()
+# Nothing connects at import: each process builds its own client on first use (see database.py).
+mongo = MongoConnection()
 
 # Define your collections 
-users_collection = db.students 
-interview_results_collection = db.interview_results
-coding_activity_collection = db.coding_activity
+users_collection = mongo.collection("students")
+interview_results_collection = mongo.collection("interview_results")
+coding_activity_collection = mongo.collection("coding_activity")
+student_stats_collection = mongo.collection("student_stats")
+interview_reports_collection = mongo.collection("interview_reports")
+activity_buckets_collection = mongo.collection("activity_buckets")
+
+# Rollup tuning: the window used for "recent activity", how many daily buckets are kept
+# per student, and how many recent items are embedded for the student dashboard.
+ACTIVITY_WINDOW_DAYS = 7
+ACTIVITY_BUCKET_LIMIT = 30
+RECENT_ITEMS_LIMIT = 5
+NEVER_ACTIVE = datetime.datetime(1970, 1, 1)
+# Remedial resources ranked on the student dashboard (see recommender.py).
+RECOMMENDATION_COUNT = 3
+
+# Faculty roster API paging and the rollup field (all indexed together with _id) behind each sort.
+ROSTER_PAGE_SIZE = 50
+ROSTER_MAX_PAGE_SIZE = 200
+ROSTER_SORTS = {"id": "_id", "score": "avg_score", "last_active": "last_active_at"}
+ROSTER_SORT_DEFAULTS = {"avg_score": 0, "last_active_at": NEVER_ACTIVE}
+# A student is flagged for intervention when their average is below this (once they have
+# one), or when they have not been active within ACTIVITY_WINDOW_DAYS.
+INTERVENTION_SCORE = 60
+
+# Interview results, coding activity and rollup updates are written behind the request.
+write_buffer = WriteBehindBuffer(
+    max_batch=int(os.getenv('WRITE_BATCH_SIZE', 500)),
+    flush_interval=float(os.getenv('WRITE_FLUSH_INTERVAL', 0.5)),
+    max_pending=int(os.getenv('WRITE_MAX_PENDING', 10000)),
+)
+
+# Password hashing runs on a bounded process pool; stored hashes are upgraded to
+# PASSWORD_HASH_METHOD on the next successful login. Login attempts are throttled per IP and per account.
+password_hasher = PasswordHasher(
+    method=os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256'),
+    max_workers=int(os.getenv('PASSWORD_WORKERS', 2)),
+    max_pending=int(os.getenv('PASSWORD_MAX_PENDING', 32)),
+    timeout=float(os.getenv('PASSWORD_TIMEOUT', 5.0)),
+    use_processes=os.getenv('PASSWORD_USE_PROCESSES', 'true').lower() == 'true',
+)
+login_throttle = LoginThrottle(
+    max_per_ip=int(os.getenv('LOGIN_MAX_PER_IP', 30)),
+    max_failures_per_user=int(os.getenv('LOGIN_MAX_FAILURES', 5)),
+    window=int(os.getenv('LOGIN_THROTTLE_WINDOW', 300)),
+)
+
+# Student dashboards are cached per user until that user's next activity write is flushed.
+dashboard_cache = DashboardCache(
+    max_entries=int(os.getenv('DASHBOARD_CACHE_SIZE', 5000)),
+    max_bytes=int(os.getenv('DASHBOARD_CACHE_BYTES', 32 * 1024 * 1024)),
+    ttl=int(os.getenv('DASHBOARD_CACHE_TTL', 60)),
+)
+
+# Answer scoring runs on a pool with a timeout; slow or failing analyzers fall back to the offline heuristic.
+analysis_engine = AnalysisEngine(
+    build_analyzer(os.getenv('ANSWER_ANALYZER', 'offline')),
+    max_workers=int(os.getenv('ANALYSIS_WORKERS', 4)),
+    timeout=float(os.getenv('ANALYSIS_TIMEOUT', 3.0)),
+    use_processes=os.getenv('ANALYSIS_USE_PROCESSES', 'false').lower() == 'true',
+)
+
+def store_interview_result(job, analysis):
+    """Scoring pipeline hook: writes one scored answer to interview_results and the rollup."""
+    remedy_key = analysis.get('improvement_category', 'communication_structure')
+    result_doc = {
+        "_id": ObjectId(),
+        "student_id": job['student_id'],
+        "interview_id": job['interview_id'],
+        "timestamp": job['answered_at'],
+        "role": job.get('role'),
+        "question": job['question']['text'],
+        "concept": job['question']['concept'],
+        "score": analysis['score'],
+        "communication_feedback": analysis['communication_feedback'],
+        "technical_feedback": analysis['technical_feedback'],
+        "improvement_category": remedy_key,
+        "remedial_resource": REMEDIAL_RESOURCES.get(remedy_key),
+    }
+    write_buffer.insert(interview_results_collection, result_doc)
+    record_student_activity(result_doc['student_id'], "interviews", result_doc, score=analysis['score'], username=job.get('username'))
+    for operation in answer_bucket_updates(result_doc, job.get('role')):
+        write_buffer.submit(activity_buckets_collection, operation)
+
+
+# Answers are scored after the request returns; see scoring_pipeline.py.
+scoring_pipeline = ScoringPipeline(
+    analysis_engine,
+    interview_reports_collection,
+    on_scored=store_interview_result,
+    workers=int(os.getenv('SCORING_WORKERS', 2)),
+    batch_size=int(os.getenv('SCORING_BATCH_SIZE', 16)),
+    max_retries=int(os.getenv('SCORING_MAX_RETRIES', 3)),
+)
+
+# In-progress interviews are kept server-side; the cookie session only holds a token.
+INTERVIEW_STORE = os.getenv('INTERVIEW_STORE', 'memory')
+if INTERVIEW_STORE == 'mongo':
+    interview_store = MongoInterviewStore(mongo.collection("interview_sessions"))
+elif INTERVIEW_STORE == 'redis':
+    interview_store = RedisInterviewStore(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+else:
+    interview_store = InMemoryInterviewStore()
 
 
 # ----------------------------------------------------
@@ -43,8 +161,7 @@ coding_activity_collection = db.coding_activity
 
 def create_sample_users():
     """Inserts sample users into the students collection."""
-    hashed_student_pass = generate_password_hash("Student@123", method='pbkdf2:sha256')
-    hashed_faculty_pass = generate_password_hash("Faculty@123", method='pbkdf2:sha256')
+    hashed_student_pass, hashed_faculty_pass = password_hasher.hash_many(["Student@123", "Faculty@123"])
 
     sample_users = [
         {"username": "student1@gmail.com", "password": hashed_student_pass, "role": "student"},
@@ -52,23 +169,316 @@ def create_sample_users():
         {"username": "student2@gmail.com", "password": hashed_student_pass, "role": "student"},
     ]
     users_collection.insert_many(sample_users)
+    student_stats_collection.insert_many([new_student_stats(u['_id'], u['username']) for u in sample_users if u['role'] == "student"])
     print("--- Sample users created in MongoDB (3 users)! ---")
 
 
-def analyze_response(question_text, student_answer, concept_key):
+def upgrade_password_hash(user, password):
+    """Re-hashes a password stored with an outdated scheme/cost, in the background after a successful login."""
+    def store(new_hash):
+        # Matching on the old hash keeps a concurrent password change from being overwritten.
+        write_buffer.update(users_collection, {"_id": user['_id'], "password": user['password']}, {"$set": {"password": new_hash}})
+    password_hasher.hash_in_background(password, store)
+
+
+def ensure_indexes():
+    """Creates the indexes every route query depends on. Safe to run on each startup."""
+    users_collection.create_index([("username", ASCENDING)], unique=True, name="username_unique")
+    users_collection.create_index([("role", ASCENDING)], name="role")
+    interview_results_collection.create_index([("student_id", ASCENDING), ("timestamp", DESCENDING)], name="student_timestamp")
+    coding_activity_collection.create_index([("student_id", ASCENDING), ("timestamp", DESCENDING)], name="student_timestamp")
+    # Date-range exports across the whole cohort (and bucket compaction) filter on timestamp alone.
+    interview_results_collection.create_index([("timestamp", ASCENDING)], name="timestamp")
+    coding_activity_collection.create_index([("timestamp", ASCENDING)], name="timestamp")
+    student_stats_collection.create_index([("avg_score", ASCENDING), ("_id", ASCENDING)], name="avg_score_id")
+    student_stats_collection.create_index([("last_active_at", ASCENDING), ("_id", ASCENDING)], name="last_active_id")
+    ensure_bucket_indexes(activity_buckets_collection)
+    if isinstance(interview_store, MongoInterviewStore):
+        interview_store.ensure_indexes()
+    if isinstance(execution_gateway.job_store, MongoJobStore):
+        execution_gateway.job_store.ensure_indexes()
+    print("--- MongoDB indexes verified. ---")
+
+
+def initialize_database():
+    """Creates indexes and, on an empty database, the sample users."""
+    ensure_indexes()
+    if users_collection.count_documents({}) == 0:
+        create_sample_users()
+    else:
+        print("--- Sample users already exist in MongoDB. Skipping creation. ---")
+
+
+def route_query_plans():
+    """
+    Lists (name, explain output) for each query shape the routes issue, using placeholder
+    values since the planner only cares about the shape.
+    """
+    sample_id = ObjectId()
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=ACTIVITY_WINDOW_DAYS)
+    finds = [
+        ("login/signup: user by username", users_collection.find({"username": "probe@example.com"}).limit(1)),
+        ("student_dashboard: stats rollup", student_stats_collection.find({"_id": sample_id}).limit(1)),
+        ("rebuild: recent interviews", interview_results_collection.find({"student_id": sample_id}).sort("timestamp", -1).limit(RECENT_ITEMS_LIMIT)),
+        ("rebuild: recent coding runs", coding_activity_collection.find({"student_id": sample_id}).sort("timestamp", -1).limit(RECENT_ITEMS_LIMIT)),
+    ]
+    for label, args in (("first page", {}), ("by score", {"sort": "score"}), ("by last activity", {"sort": "last_active", "order": "desc"}),
+                        ("needs intervention", {"intervention": "1"}), ("score range", {"sort": "score", "min_score": "40", "max_score": "70"})):
+        query, sort, _ = roster_query(args, since)
+        finds.append((f"faculty roster: {label}", student_stats_collection.find(query).sort(sort).limit(ROSTER_PAGE_SIZE + 1)))
+    date_range = {"$gte": since, "$lt": datetime.datetime.utcnow()}
+    for name, collection in (("interview_results", interview_results_collection), ("coding_activity", coding_activity_collection)):
+        projection = {field: 1 for field in EXPORT_FIELDS[name]}
+        finds += [
+            (f"faculty_export: {name} by date range", collection.find({"timestamp": date_range}, projection)),
+            (f"faculty_export: {name} by cohort and date range", collection.find({"timestamp": date_range, "student_id": {"$in": [sample_id]}}, projection)),
+        ]
+    finds += [
+        ("analytics: trend series", activity_buckets_collection.find({"dimension": "student", "granularity": "week", "key": sample_id, "period_start": {"$gte": since}})),
+        ("analytics: heatmap", activity_buckets_collection.find({"dimension": "category", "granularity": "week", "period_start": {"$gte": since}})),
+    ]
+    return [(name, cursor.explain()) for name, cursor in finds]
+
+
+def plan_stages(explain_output):
+    """Yields every plan stage name found anywhere in an explain() document."""
+    if isinstance(explain_output, dict):
+        if isinstance(explain_output.get('stage'), str):
+            yield explain_output['stage']
+        for value in explain_output.values():
+            yield from plan_stages(value)
+    elif isinstance(explain_output, list):
+        for value in explain_output:
+            yield from plan_stages(value)
+
+
+def activity_day(timestamp):
+    """Truncates a timestamp to the UTC day used as the rollup bucket key."""
+    return datetime.datetime(timestamp.year, timestamp.month, timestamp.day)
+
+
+def new_student_stats(student_id, username):
+    """The empty rollup every student starts with, so the roster can be served from student_stats alone."""
+    return {
+        "_id": student_id, "username": username, "interviews_count": 0, "coding_count": 0,
+        "interview_score_sum": 0, "avg_score": 0, "last_active_at": NEVER_ACTIVE,
+        "daily_activity": [], "recent_interviews": [], "recent_coding": [], "mastery": {},
+    }
+
+
+def record_student_activity(student_id, kind, document, score=None, username=None):
+    """
+    Folds one new interview answer or coding run into the student's `student_stats` rollup.
+    `kind` is either 'interviews' or 'coding'. The running totals, today's activity bucket
+    and the capped list of recent items (plus, for a scored answer, the concept mastery map
+    used for adaptive question selection) are updated by a single pipeline upsert, so it is
+    atomic on its own and can be batched by the write buffer, and dashboards never need to
+    scan the raw history. A rollup the upsert has to create gets every field the roster
+    sorts and displays (username, avg_score), not just the ones this event touches.
+    """
+    day = activity_day(document['timestamp'])
+    daily = {"$ifNull": ["$daily_activity", []]}
+    new_bucket = {"day": day, "interviews": 0, "coding": 0}
+    new_bucket[kind] = 1
+
+    changes = {
+        "username": {"$ifNull": ["$username", username]},
+        "avg_score": {"$ifNull": ["$avg_score", 0]},
+        f"{kind}_count": {"$add": [{"$ifNull": [f"${kind}_count", 0]}, 1]},
+        "last_active_at": {"$max": [{"$ifNull": ["$last_active_at", NEVER_ACTIVE]}, document['timestamp']]},
+        f"recent_{kind}": {"$slice": [
+            {"$concatArrays": [{"$ifNull": [f"$recent_{kind}", []]}, [{"$literal": document}]]},
+            -RECENT_ITEMS_LIMIT,
+        ]},
+        # Bump today's bucket if it exists, otherwise open one and drop the oldest.
+        "daily_activity": {"$cond": [
+            {"$in": [day, {"$ifNull": ["$daily_activity.day", []]}]},
+            {"$map": {"input": daily, "in": {"$cond": [
+                {"$eq": ["$$this.day", day]},
+                {"$mergeObjects": ["$$this", {kind: {"$add": [f"$$this.{kind}", 1]}}]},
+                "$$this",
+            ]}}},
+            {"$slice": [{"$concatArrays": [daily, [{"$literal": new_bucket}]]}, -ACTIVITY_BUCKET_LIMIT]},
+        ]},
+    }
+    if score is not None:
+        # Field references inside one $set stage see the old values, hence the explicit +score / +1.
+        new_sum = {"$add": [{"$ifNull": ["$interview_score_sum", 0]}, score]}
+        changes["interview_score_sum"] = new_sum
+        changes["avg_score"] = {"$round": [{"$divide": [new_sum, {"$add": [{"$ifNull": ["$interviews_count", 0]}, 1]}]}, 1]}
+        changes.update(mastery_update_fields(document['concept'], document.get('improvement_category'), score))
+
+    write_buffer.update(
+        student_stats_collection, {"_id": student_id}, [{"$set": changes}], upsert=True,
+        on_written=lambda: dashboard_cache.invalidate(student_id),
+    )
+
+
+def summarize_student_stats(stats, since):
+    """Turns a `student_stats` document into the numbers shown on the dashboards."""
+    stats = stats or {}
+    interview_count = stats.get('interviews_count', 0)
+    avg_score = round(stats.get('interview_score_sum', 0) / interview_count, 1) if interview_count else 0
+    recent_buckets = [b for b in stats.get('daily_activity', []) if b['day'] >= activity_day(since)]
+    return {
+        "avg_score": avg_score,
+        "interview_count": interview_count,
+        "coding_count": stats.get('coding_count', 0),
+        "recent_interviews": sum(b['interviews'] for b in recent_buckets),
+        "recent_coding": sum(b['coding'] for b in recent_buckets),
+    }
+
+
+def rebuild_student_stats():
+    """
+    Recomputes every `student_stats` rollup from the raw `interview_results` and
+    `coding_activity` history. Only needed once for data written before the rollup existed,
+    or to repair drift; the request path keeps the rollup current incrementally.
+    """
+    since = activity_day(datetime.datetime.utcnow()) - datetime.timedelta(days=ACTIVITY_BUCKET_LIMIT - 1)
+    rollups = {
+        student['_id']: new_student_stats(student['_id'], student['username'])
+        for student in users_collection.find({"role": "student"}, {"username": 1})
+    }
+    for stats in rollups.values():
+        stats["daily_activity"] = {}
+
+    for kind, collection in (("interviews", interview_results_collection), ("coding", coding_activity_collection)):
+        totals = collection.aggregate([
+            {"$group": {"_id": "$student_id", "count": {"$sum": 1}, "score_sum": {"$sum": "$score"}, "last": {"$max": "$timestamp"}}},
+        ])
+        for row in totals:
+            stats = rollups.get(row['_id'])
+            if stats is None:
+                continue  # History of a deleted account.
+            stats[f"{kind}_count"] = row['count']
+            stats["last_active_at"] = max(stats["last_active_at"], row['last'])
+            if kind == "interviews":
+                stats["interview_score_sum"] = row['score_sum']
+                stats["avg_score"] = round(row['score_sum'] / row['count'], 1)
+
+        buckets = collection.aggregate([
+            {"$match": {"timestamp": {"$gte": since}}},
+            {"$group": {
+                "_id": {"student_id": "$student_id", "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}},
+                "count": {"$sum": 1},
+            }},
+        ])
+        for row in buckets:
+            if row['_id']['student_id'] not in rollups:
+                continue
+            daily = rollups[row['_id']['student_id']]["daily_activity"]
+            bucket = daily.setdefault(row['_id']['day'], {"day": row['_id']['day'], "interviews": 0, "coding": 0})
+            bucket[kind] = row['count']
+
+    for student_id, stats in rollups.items():
+        stats["daily_activity"] = sorted(stats["daily_activity"].values(), key=lambda b: b['day'])
+        if stats["interviews_count"]:
+            for answer in interview_results_collection.find(
+                {"student_id": student_id}, {"_id": 0, "concept": 1, "improvement_category": 1, "score": 1},
+            ).sort("timestamp", 1):
+                apply_mastery(stats["mastery"], answer['concept'], answer.get('improvement_category'), answer['score'])
+            stats["recent_interviews"] = list(interview_results_collection.find({"student_id": student_id}).sort("timestamp", -1).limit(RECENT_ITEMS_LIMIT))[::-1]
+        if stats["coding_count"]:
+            stats["recent_coding"] = list(coding_activity_collection.find({"student_id": student_id}).sort("timestamp", -1).limit(RECENT_ITEMS_LIMIT))[::-1]
+        student_stats_collection.replace_one({"_id": student_id}, stats, upsert=True)
+
+    return len(rollups)
+
+
+def compact_activity_buckets(days=None):
+    """
+    Recomputes the analytics buckets from `interview_results` and `coding_activity`, for all
+    history or for the periods that started within the last `days` days. The request path
+    keeps the buckets current incrementally; this backfills history and repairs buckets
+    that missed an update (e.g. a write dropped by the write buffer).
+    """
+    since = NEVER_ACTIVE
+    if days is not None:
+        # Start on a week boundary so no day or week bucket is recomputed from partial data.
+        since = period_start(datetime.datetime.utcnow() - datetime.timedelta(days=days), "week")
+    sources = {"interview_results": interview_results_collection, "coding_activity": coding_activity_collection}
+    for source, pipeline in compaction_pipelines(since, activity_buckets_collection.name):
+        sources[source].aggregate(pipeline)
+
+
+def encode_roster_cursor(sort_field, stats):
+    """Opaque keyset cursor: the last row's sort value and _id."""
+    value = stats.get(sort_field, ROSTER_SORT_DEFAULTS.get(sort_field))
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    return f"{value}|{stats['_id']}" if sort_field != "_id" else str(value)
+
+
+def decode_roster_cursor(sort_field, cursor):
+    if sort_field == "_id":
+        return None, ObjectId(cursor)
+    value, _, last_id = cursor.rpartition("|")
+    value = float(value) if sort_field == "avg_score" else datetime.datetime.fromisoformat(value)
+    return value, ObjectId(last_id)
+
+
+def intervention_query(since):
+    """The student_stats filter for students needing intervention; matches needs_intervention()."""
+    return {"$or": [{"avg_score": {"$gt": 0, "$lt": INTERVENTION_SCORE}}, {"last_active_at": {"$lt": since}}]}
+
+
+def needs_intervention(stats, since):
+    avg_score = stats.get('avg_score', 0)
+    return 0 < avg_score < INTERVENTION_SCORE or stats.get('last_active_at', NEVER_ACTIVE) < since
+
+
+def roster_query(args, since):
     """
-    PHASE 3: MOCK LLM ANALYSIS FUNCTION - Used for demonstration.
+    Translates roster API parameters into a student_stats query, sort and page size.
+    Filters: intervention=1, min_score/max_score, inactive_days. Sorting is by `sort`
+    (id, score or last_active) then _id, resumed after `cursor` with keyset pagination, so
+    every page is an index range scan no matter how deep into the roster it is.
+    Raises ValueError on malformed parameters.
     """
-    mock_score = random.randint(30, 95)
-    mock_category = random.choice(list(REMEDIAL_RESOURCES.keys()))
-
-    mock_analysis = {
-        "score": mock_score,
-        "communication_feedback": f"MOCK: Your structure needs polish. Focus on organizing thoughts for {concept_key}.",
-        "technical_feedback": f"MOCK: Concept {concept_key} explanation was {mock_score//10 * 10}% accurate.",
-        "improvement_category": mock_category 
+    sort_field = ROSTER_SORTS.get(args.get('sort', 'id'))
+    if sort_field is None:
+        raise ValueError("sort must be one of: " + ", ".join(ROSTER_SORTS))
+    direction = DESCENDING if args.get('order') == 'desc' else ASCENDING
+    limit = min(max(int(args.get('limit', ROSTER_PAGE_SIZE)), 1), ROSTER_MAX_PAGE_SIZE)
+
+    clauses = []
+    if args.get('intervention') in ('1', 'true'):
+        clauses.append(intervention_query(since))
+    score_range = {}
+    if args.get('min_score'):
+        score_range["$gte"] = float(args['min_score'])
+    if args.get('max_score'):
+        score_range["$lte"] = float(args['max_score'])
+    if score_range:
+        clauses.append({"avg_score": score_range})
+    if args.get('inactive_days'):
+        clauses.append({"last_active_at": {"$lt": datetime.datetime.utcnow() - datetime.timedelta(days=int(args['inactive_days']))}})
+
+    if args.get('cursor'):
+        value, last_id = decode_roster_cursor(sort_field, args['cursor'])
+        after = "$gt" if direction == ASCENDING else "$lt"
+        if sort_field == "_id":
+            clauses.append({"_id": {after: last_id}})
+        else:
+            clauses.append({"$or": [{sort_field: {after: value}}, {sort_field: value, "_id": {after: last_id}}]})
+
+    query = {"$and": clauses} if clauses else {}
+    sort = [(sort_field, direction)] if sort_field == "_id" else [(sort_field, direction), ("_id", direction)]
+    return query, sort, limit
+
+
+def roster_row(stats, since):
+    """Shapes one student_stats document into a roster row."""
+    summary = summarize_student_stats(stats, since)
+    total_activity = summary['recent_interviews'] + summary['recent_coding']
+    return {
+        "id": str(stats['_id']),
+        "username": (stats.get('username') or '').split('@')[0],
+        "last_score": summary['avg_score'],
+        "total_activity": total_activity,
+        "intervention_needed": needs_intervention(stats, since),
     }
-    return mock_analysis
 
 
 # ----------------------------------------------------
@@ -87,14 +497,24 @@ def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
-        user = users_collection.find_one({"username": username})
+        try:
+            login_throttle.check(username, request.remote_addr)
+            user = users_collection.find_one({"username": username})
+            valid = user is not None and password_hasher.verify(user['password'], password)
+        except LoginRejected as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('login'))
 
-        if user and check_password_hash(user['password'], password):
+        if valid:
+            login_throttle.record_success(username)
+            if password_hasher.needs_rehash(user['password']):
+                upgrade_password_hash(user, password)
             session['user_id'] = str(user['_id'])
             session['role'] = user['role']
             session['username'] = user['username']
             return redirect(url_for('student_dashboard' if user['role'] == 'student' else 'faculty_dashboard'))
         else:
+            login_throttle.record_failure(username)
             flash("Invalid username or password.", 'danger')
             return redirect(url_for('login'))
     
@@ -110,13 +530,23 @@ def signup():
             flash("Account already exists with this email.", 'danger')
             return redirect(url_for('signup'))
         
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+        try:
+            hashed_password = password_hasher.hash(password)
+        except LoginRejected as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('signup'))
         
-        result = users_collection.insert_one({
-            "username": username,
-            "password": hashed_password,
-            "role": "student"
-        })
+        try:
+            result = users_collection.insert_one({
+                "username": username,
+                "password": hashed_password,
+                "role": "student"
+            })
+        except DuplicateKeyError:
+            # A concurrent sign-up for the same email won the race (username_unique index).
+            flash("Account already exists with this email.", 'danger')
+            return redirect(url_for('signup'))
+        student_stats_collection.insert_one(new_student_stats(result.inserted_id, username))
 
         # Automatic Login Logic
         session['user_id'] = str(result.inserted_id)
@@ -141,56 +571,164 @@ def student_dashboard():
     if 'role' not in session or session['role'] != 'student': return redirect(url_for('login'))
     
     user_id = ObjectId(session['user_id'])
-    
-    # Fetch recent activity
-    recent_interviews = interview_results_collection.find({"student_id": user_id}).sort("timestamp", -1).limit(5)
-    recent_coding = coding_activity_collection.find({"student_id": user_id}).sort("timestamp", -1).limit(5)
+    dashboard = dashboard_cache.get(user_id)
+    if dashboard is None:
+        dashboard = load_student_dashboard(user_id)
 
     return render_template(
         'student.html', 
         username=session['username'].split('@')[0],
-        interviews=list(recent_interviews),
-        coding_activity=list(recent_coding)
+        **dashboard
     )
 
+def load_student_dashboard(user_id):
+    """Queries the student's rollup and renders the activity list, caching both for the next visit."""
+    generation = dashboard_cache.generation(user_id)
+
+    # Recent activity and totals come precomputed from the student's rollup document
+    stats = student_stats_collection.find_one({"_id": user_id}) or {}
+    one_week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=ACTIVITY_WINDOW_DAYS)
+    interviews = stats.get('recent_interviews', [])[::-1]
+    recent_activity = sorted(interviews + stats.get('recent_coding', []), key=lambda item: item['timestamp'], reverse=True)
+
+    activity_html = Markup(render_template('student_activity.html', recent_activity=recent_activity[:6]))
+    dashboard = {
+        "latest_interview": interviews[0] if interviews else None,
+        "activity_html": activity_html,
+        "stats": summarize_student_stats(stats, one_week_ago),
+        # Ranked for everything the student has been weak on, not just the latest answer.
+        "recommendations": RESOURCE_RECOMMENDER.recommend(stats.get('mastery'), k=RECOMMENDATION_COUNT),
+    }
+    size = len(activity_html) + len(json.dumps([dashboard['latest_interview'], dashboard['recommendations']], default=str))
+    dashboard_cache.put(user_id, dashboard, size, generation)
+    return dashboard
+
 @app.route('/faculty_dashboard')
 def faculty_dashboard():
     if 'role' not in session or session['role'] != 'faculty': return redirect(url_for('login'))
     
-    all_students = users_collection.find({"role": "student"})
-    student_data = []
+    # The roster itself is fetched page by page from faculty_roster by the template.
+    return render_template(
+        'faculty.html', 
+        username=session['username'].split('@')[0]
+    )
 
-    one_week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=7)
+@app.route('/faculty/roster', methods=['GET'])
+def faculty_roster():
+    if 'role' not in session or session['role'] != 'faculty': return jsonify({"error": "Not logged in."}), 401
 
-    for student in all_students:
-        student_id = student['_id']
-        
-        interview_stats = list(interview_results_collection.aggregate([
-            {"$match": {"student_id": student_id}},
-            {"$group": {"_id": None, "avg_score": {"$avg": "$score"}}}
-        ]))
-        
-        avg_score = round(interview_stats[0]['avg_score'], 1) if interview_stats else 0
-        
-        recent_interview_count = interview_results_collection.count_documents({"student_id": student_id, "timestamp": {"$gte": one_week_ago}})
-        recent_coding_count = coding_activity_collection.count_documents({"student_id": student_id, "timestamp": {"$gte": one_week_ago}})
-        
-        total_recent_activity = recent_interview_count + recent_coding_count
-        
-        intervention = (avg_score < 60 and avg_score > 0) or (total_recent_activity == 0)
-
-        student_data.append({
-            "id": str(student_id),
-            "username": student['username'].split('@')[0],
-            "last_score": avg_score,
-            "total_activity": total_recent_activity,
-            "intervention_needed": intervention,
-        })
+    one_week_ago = datetime.datetime.utcnow() - datetime.timedelta(days=ACTIVITY_WINDOW_DAYS)
+    try:
+        query, sort, limit = roster_query(request.args, one_week_ago)
+    except (ValueError, InvalidId) as e:
+        return jsonify({"error": f"Invalid roster parameters: {e}"}), 400
 
-    return render_template(
-        'faculty.html', 
-        username=session['username'].split('@')[0],
-        student_data=student_data
+    projection = {"username": 1, "interviews_count": 1, "coding_count": 1, "interview_score_sum": 1, "avg_score": 1, "last_active_at": 1, "daily_activity": 1}
+    page = list(student_stats_collection.find(query, projection).sort(sort).limit(limit + 1))
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return jsonify({
+        "students": [roster_row(stats, one_week_ago) for stats in page],
+        "next_cursor": encode_roster_cursor(sort[0][0], page[-1]) if has_more else None,
+    })
+
+
+# Trend charts and heatmaps read the pre-aggregated buckets in analytics.py.
+ANALYTICS_MAX_PERIODS = {"day": 180, "week": 104}
+
+def analytics_params(args, default_periods):
+    granularity = args.get('granularity', 'week')
+    if granularity not in ANALYTICS_MAX_PERIODS:
+        raise ValueError("granularity must be 'day' or 'week'")
+    periods = min(max(int(args.get('periods', default_periods)), 1), ANALYTICS_MAX_PERIODS[granularity])
+    return granularity, periods
+
+@app.route('/faculty/analytics/trends', methods=['GET'])
+def faculty_trends():
+    if 'role' not in session or session['role'] != 'faculty': return jsonify({"error": "Not logged in."}), 401
+
+    dimension = request.args.get('dimension', 'cohort')
+    try:
+        granularity, periods = analytics_params(request.args, 12)
+        if dimension == 'cohort':
+            key = COHORT_KEY
+        elif dimension == 'student':
+            key = ObjectId(request.args['key'])
+        elif dimension in ('role', 'category'):
+            key = request.args['key']
+        else:
+            raise ValueError("dimension must be one of: cohort, student, role, category")
+    except (KeyError, ValueError, InvalidId) as e:
+        return jsonify({"error": f"Invalid trend parameters: {e}"}), 400
+
+    series = trend_series(activity_buckets_collection, dimension, key, granularity, periods, datetime.datetime.utcnow())
+    return jsonify({"dimension": dimension, "key": str(key), "granularity": granularity, "series": series})
+
+@app.route('/faculty/analytics/heatmap', methods=['GET'])
+def faculty_heatmap():
+    if 'role' not in session or session['role'] != 'faculty': return jsonify({"error": "Not logged in."}), 401
+
+    dimension = request.args.get('dimension', 'category')
+    try:
+        granularity, periods = analytics_params(request.args, 8)
+        if dimension not in ('role', 'category'):
+            raise ValueError("dimension must be 'role' or 'category'")
+    except ValueError as e:
+        return jsonify({"error": f"Invalid heatmap parameters: {e}"}), 400
+
+    grid = heatmap(activity_buckets_collection, dimension, granularity, periods, datetime.datetime.utcnow())
+    return jsonify(dict(grid, dimension=dimension, granularity=granularity))
+
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+
+@app.route('/faculty/export', methods=['GET'])
+def faculty_export():
+    """
+    Streams interview_results and/or coding_activity as CSV or JSONL.
+    Query parameters: dataset (interview_results, coding_activity or all), format (csv or
+    jsonl), cohort (matches the optional `cohort` field on student documents), and
+    start/end dates (YYYY-MM-DD, end inclusive).
+    """
+    if 'role' not in session or session['role'] != 'faculty': return redirect(url_for('login'))
+
+    dataset = request.args.get('dataset', 'all')
+    export_format = request.args.get('format', 'csv')
+    datasets = list(EXPORT_FIELDS) if dataset == 'all' else [dataset]
+    if any(name not in EXPORT_FIELDS for name in datasets) or export_format not in ('csv', 'jsonl'):
+        return jsonify({"error": "Unsupported dataset or format."}), 400
+
+    query = {}
+    try:
+        if request.args.get('start'):
+            query.setdefault("timestamp", {})["$gte"] = datetime.datetime.strptime(request.args['start'], "%Y-%m-%d")
+        if request.args.get('end'):
+            query.setdefault("timestamp", {})["$lt"] = datetime.datetime.strptime(request.args['end'], "%Y-%m-%d") + datetime.timedelta(days=1)
+    except ValueError:
+        return jsonify({"error": "Dates must be formatted as YYYY-MM-DD."}), 400
+
+    # Student names are resolved once up front; rows then stream straight from the cursors.
+    student_filter = {"role": "student"}
+    if request.args.get('cohort'):
+        student_filter["cohort"] = request.args['cohort']
+    usernames = {s['_id']: s['username'] for s in users_collection.find(student_filter, {"username": 1})}
+    if request.args.get('cohort'):
+        query["student_id"] = {"$in": list(usernames)}
+
+    collections = {"interview_results": interview_results_collection, "coding_activity": coding_activity_collection}
+    sources = [
+        (name, collections[name].find(query, {field: 1 for field in EXPORT_FIELDS[name]}).batch_size(EXPORT_BATCH_SIZE))
+        for name in datasets
+    ]
+    rows = export_rows(sources, usernames)
+    body = stream_csv(rows, datasets) if export_format == 'csv' else stream_jsonl(rows)
+
+    filename = f"campus360-{dataset}-{datetime.datetime.utcnow():%Y%m%d}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype="text/csv" if export_format == 'csv' else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
 
 
@@ -205,35 +743,28 @@ def start_interview():
     if request.method == 'POST':
         role = request.form.get('target_role')
         
-        if not role or role not in INTERVIEW_QUESTIONS_BY_ROLE:
+        if not role or not QUESTION_BANK.has_role(role):
             flash("Please select your target job role.", 'danger')
             return redirect(url_for('start_interview'))
 
-        tech_pool = INTERVIEW_QUESTIONS_BY_ROLE.get(role, [])
-        
-        # --- BUILD THE 10-QUESTION FINAL LIST ---
-        final_q_list = PHASE_INTRODUCTION_Q[:] 
-        
-        # 2. Technical (5 questions: 2 easy/medium, 3 medium/hard)
-        easy_med_tech = [q for q in tech_pool if q['difficulty'] in ['easy', 'medium']]
-        hard_tech = [q for q in tech_pool if q['difficulty'] in ['medium', 'hard']]
-        
-        random.shuffle(easy_med_tech)
-        random.shuffle(hard_tech)
-        final_q_list.extend(easy_med_tech[:2])
-        final_q_list.extend(hard_tech[:3])
-
-        # 3. Soft Skills (3 random questions)
-        random.shuffle(PHASE_SOFT_SKILL_Q)
-        final_q_list.extend(PHASE_SOFT_SKILL_Q[:3])
+        # --- BUILD THE 10-QUESTION FINAL LIST (question IDs) ---
+        # 2 intro, 2 easy/medium + 3 medium/hard technical, 3 soft skills (see question_bank.py)
+        # Weighted towards the student's weak concepts: one _id lookup of their rollup.
+        stats = student_stats_collection.find_one({"_id": ObjectId(session['user_id'])}, {"mastery": 1})
+        final_q_ids = QUESTION_BANK.build_interview(role, mastery=(stats or {}).get('mastery'))
         
-        # Initialize session state
-        session['interview_state'] = {
+        # Initialize server-side interview state and its (initially empty) report
+        token = secrets.token_urlsafe(16)
+        interview_id = ObjectId()
+        scoring_pipeline.open_interview(interview_id, ObjectId(session['user_id']), role, len(final_q_ids))
+        interview_store.save(token, {
+            'interview_id': str(interview_id),
             'role': role,
             'current_index': 0,
-            'question_list': final_q_list, 
-            'total_questions': len(final_q_list),
-        }
+            'question_ids': final_q_ids, 
+            'total_questions': len(final_q_ids),
+        })
+        session['interview_token'] = token
         
         return redirect(url_for('next_question'))
 
@@ -247,7 +778,8 @@ def start_interview():
 
 @app.route('/next_question', methods=['GET'])
 def next_question():
-    state = session.get('interview_state')
+    token = session.get('interview_token')
+    state = interview_store.get(token) if token else None
     if not state:
         flash("Interview session expired. Please restart.", 'danger')
         return redirect(url_for('start_interview'))
@@ -256,12 +788,14 @@ def next_question():
     
     if current_index >= state['total_questions']:
         # Interview is complete
-        session.pop('interview_state', None) 
-        flash(f"Congratulations! Your systematic interview for {state['role']} is complete. View your full report.", 'success')
+        interview_store.delete(token)
+        session.pop('interview_token', None) 
+        report_url = url_for('interview_report', interview_id=state['interview_id'])
+        flash(Markup('Congratulations! Your systematic interview for {} is complete. Your <a href="{}" class="alert-link">full report</a> will be ready once scoring finishes.').format(state['role'], report_url), 'success')
         return redirect(url_for('student_dashboard'))
     
     # GET CURRENT QUESTION
-    question_data = state['question_list'][current_index]
+    question_data = QUESTION_BANK.get(state['question_ids'][current_index])
     
     q_key = f"{state['role']}_Q{current_index}_{question_data['concept']}"
     
@@ -270,47 +804,49 @@ def next_question():
 
 @app.route('/process_interview', methods=['POST'])
 def process_interview():
-    if 'role' not in session or not session.get('interview_state'):
+    token = session.get('interview_token')
+    state = interview_store.get(token) if token else None
+    if 'role' not in session or not state or state['current_index'] >= state['total_questions']:
         flash("Session error. Please restart the interview.", 'danger')
         return redirect(url_for('start_interview'))
     
-    state = session['interview_state']
-    
-    # PROCESS AND LOG ANSWER
-    full_q_key = request.form.get('question_key')
-    student_answer = request.form.get('student_answer')
-    question_text = request.form.get('question_text')
-
-    concept_key = full_q_key.split('_')[-1]
-    
-    analysis = analyze_response(question_text, student_answer, concept_key)
-    
-    if analysis is None:
-        flash("Error processing answer with AI. Logging stopped.", 'danger')
-    else:
-        remedy_key = analysis.get('improvement_category', 'communication_structure')
-        resource = REMEDIAL_RESOURCES.get(remedy_key)
-        
-        interview_results_collection.insert_one({
-            "student_id": ObjectId(session['user_id']),
-            "timestamp": datetime.datetime.utcnow(),
-            "question": question_text,
-            "score": analysis['score'],
-            "communication_feedback": analysis['communication_feedback'],
-            "technical_feedback": analysis['technical_feedback'],
-            "improvement_category": remedy_key,
-            "remedial_resource": resource,
-        })
-        
-        flash(f"Answer received and analyzed! Score: {analysis['score']}%.", 'info')
+    # QUEUE THE ANSWER FOR SCORING (the question itself comes from the server-side state)
+    question = QUESTION_BANK.get(state['question_ids'][state['current_index']])
+    try:
+        scoring_pipeline.enqueue(
+            ObjectId(state['interview_id']),
+            ObjectId(session['user_id']),
+            state['current_index'],
+            question,
+            request.form.get('student_answer'),
+            role=state['role'],
+            username=session['username'],
+        )
+    except ScoringRejected as e:
+        # The interview does not advance, so the same question is shown again.
+        flash(str(e), 'warning')
+        return redirect(url_for('next_question'))
+    flash("Answer received! It is being analyzed in the background.", 'info')
 
     # ADVANCE THE INTERVIEW STATE
     state['current_index'] += 1
-    session['interview_state'] = state
+    interview_store.save(token, state)
     
     # REDIRECT TO NEXT QUESTION
     return redirect(url_for('next_question'))
 
+@app.route('/interview_reports/<interview_id>', methods=['GET'])
+def interview_report(interview_id):
+    if 'role' not in session or session['role'] != 'student': return jsonify({"error": "Not logged in."}), 401
+    if not ObjectId.is_valid(interview_id): return jsonify({"error": "Report not found."}), 404
+
+    report = interview_reports_collection.find_one({"_id": ObjectId(interview_id), "student_id": ObjectId(session['user_id'])})
+    if report is None:
+        return jsonify({"error": "Report not found."}), 404
+    report['_id'] = str(report['_id'])
+    report['student_id'] = str(report['student_id'])
+    return jsonify(report)
+
 
 # ----------------------------------------------------
 # COMPILER & ROADMAP ROUTES
@@ -318,36 +854,82 @@ def process_interview():
 
 COMPILER_LANGUAGES = {"python": "3.10", "c": "10.2.0", "cpp": "10.2.0", "java": "15.0.2"}
 
+
+def log_coding_activity(job):
+    """Gateway completion hook: records a finished run in coding_activity and the rollup."""
+    if job['status'] is None:
+        return  # The run never reached the executor (connection/backend error).
+    activity_doc = {"_id": ObjectId(), "student_id": ObjectId(job['user_id']), "timestamp": datetime.datetime.utcnow(), "language": job['language'], "status": job['status'], "code_snippet": job['code'][:100]}
+    write_buffer.insert(coding_activity_collection, activity_doc)
+    record_student_activity(activity_doc['student_id'], "coding", activity_doc, username=job.get('username'))
+    for operation in coding_bucket_updates(activity_doc):
+        write_buffer.submit(activity_buckets_collection, operation)
+
+
+execution_gateway = ExecutionGateway(
+    instrumentation.timed_executor(build_executor(os.getenv('CODE_EXECUTOR', 'piston')), languages=COMPILER_LANGUAGES),
+    max_workers=int(os.getenv('EXEC_MAX_WORKERS', 8)),
+    max_queue=int(os.getenv('EXEC_MAX_QUEUE', 200)),
+    rate_limit=int(os.getenv('EXEC_RATE_LIMIT', 10)),
+    rate_window=int(os.getenv('EXEC_RATE_WINDOW', 60)),
+    on_complete=log_coding_activity,
+    cache=ResultCache(max_entries=int(os.getenv('EXEC_CACHE_SIZE', 1000)), ttl=int(os.getenv('EXEC_CACHE_TTL', 3600))),
+    # Polls may reach any worker process; 'mongo' shares results between them (wsgi.py defaults to it).
+    job_store=MongoJobStore(mongo.collection("compiler_jobs")) if os.getenv('EXEC_JOB_STORE', 'memory') == 'mongo' else None,
+)
+
+
+def collect_execution_cache_metrics(registry):
+    """Copies this process's compiler result cache counters into /metrics."""
+    stats = execution_gateway.cache.stats()
+    for field in ("hits", "misses", "evictions"):
+        registry.set(f"compiler_cache_{field}_total", {}, stats[field])
+    registry.set("compiler_cache_entries", {}, stats['entries'])
+    registry.set("compiler_cache_hit_ratio", {}, stats['hit_rate'])
+
+
+instrumentation.registry.describe("compiler_cache_hits_total", "counter", "Compiler submissions answered from the result cache.")
+instrumentation.registry.describe("compiler_cache_misses_total", "counter", "Compiler submissions that had to be executed.")
+instrumentation.registry.describe("compiler_cache_evictions_total", "counter", "Result cache entries evicted to stay within EXEC_CACHE_SIZE.")
+instrumentation.registry.describe("compiler_cache_entries", "gauge", "Results currently held in the compiler result cache.")
+instrumentation.registry.describe("compiler_cache_hit_ratio", "gauge", "Share of compiler cache lookups that hit, since the process started.")
+instrumentation.registry.add_collector(collect_execution_cache_metrics)
+
 @app.route('/compiler', methods=['GET', 'POST'])
 def compiler():
     if 'role' not in session or session['role'] != 'student': return redirect(url_for('login'))
     
     output = None
+    job_id = None
     code = "print('Hello World')" 
     lang = "python"
     
     if request.method == 'POST':
-        code = request.form.get('code_input')
+        code = request.form.get('code_input') or ""
         lang = request.form.get('language')
-        api_url = "https://emkc.org/api/v2/piston/execute"
-        payload = {"language": lang, "version": COMPILER_LANGUAGES.get(lang), "files": [{"content": code}]}
-        status = "Execution Success"
-        
-        try:
-            response = requests.post(api_url, json=payload, timeout=15)
-            result = response.json()
-            if result.get('run', {}).get('output'):
-                output = result['run']['output']
-                status = "Success" if result['run']['code'] == 0 else "Runtime Error"
-            else:
-                output = result.get('compile', {}).get('output') or "Execution failed or timed out."
-                status = "Compile Error"
-                
-            coding_activity_collection.insert_one({"student_id": ObjectId(session['user_id']), "timestamp": datetime.datetime.utcnow(), "language": lang, "status": status, "code_snippet": code[:100]})
-        except requests.exceptions.RequestException as e:
-            output = f"API Connection Error: ({e})"
+
+        if lang not in COMPILER_LANGUAGES:
+            output = f"Unsupported language. Choose one of: {', '.join(COMPILER_LANGUAGES)}."
+            lang = "python"
+        elif not code.strip():
+            output = "Please enter some code to run."
+        else:
+            # Queue the run and return immediately; the page polls compiler_job for the result.
+            try:
+                job_id = execution_gateway.submit(session['user_id'], lang, COMPILER_LANGUAGES[lang], code, username=session['username'])
+            except ExecutionRejected as e:
+                output = str(e)
             
-    return render_template('compiler.html', output=output, code=code, selected_lang=lang, languages=COMPILER_LANGUAGES)
+    return render_template('compiler.html', output=output, job_id=job_id, code=code, selected_lang=lang, languages=COMPILER_LANGUAGES)
+
+@app.route('/compiler/jobs/<job_id>', methods=['GET'])
+def compiler_job(job_id):
+    if 'role' not in session or session['role'] != 'student': return jsonify({"error": "Not logged in."}), 401
+
+    job = execution_gateway.poll(job_id, session['user_id'])
+    if job is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    return jsonify(job)
 
 @app.route('/roadmap', methods=['GET'])
 def roadmap():
@@ -379,18 +961,111 @@ def roadmap():
     return render_template('roadmap.html', roadmap_url=roadmap_url, roles=roles, selected_path=roadmap_path)
 
 
+# ----------------------------------------------------
+# METRICS
+# ----------------------------------------------------
+
+def metrics_authorized():
+    """Metrics are open unless METRICS_TOKEN is set, in which case scrapers send it as a bearer token."""
+    return not METRICS_TOKEN or secrets.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}")
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not metrics_authorized(): return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(instrumentation.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/metrics/slow_requests', methods=['GET'])
+def slow_requests():
+    if not metrics_authorized(): return jsonify({"error": "Unauthorized."}), 401
+    return jsonify(list(instrumentation.slow_requests))
+
+
+# ----------------------------------------------------
+# HEALTH CHECKS
+# ----------------------------------------------------
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the worker is up and serving requests. Never touches the database."""
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: MongoDB answers a ping within READINESS_TIMEOUT_MS."""
+    try:
+        mongo.ping(app.config['READINESS_TIMEOUT_MS'])
+    except Exception as e:
+        return jsonify({"status": "unavailable", "mongo": str(e)}), 503
+    return jsonify({"status": "ready", "mongo": "ok", "pid": os.getpid()})
+
+
 # ----------------------------------------------------
 # STARTUP LOGIC
 # ----------------------------------------------------
 
+def create_app(config=None):
+    """
+    Application factory: applies config.load_config() plus `config` overrides to the app
+    and its Mongo connection, and returns the app. It does not touch the database, so it
+    is safe to call in a server's master process before workers are forked.
+    """
+    settings = load_config(config)
+    app.config.update(settings)
+    app.secret_key = settings['SECRET_KEY']
+    mongo.configure(
+        settings['MONGO_URI'], settings['MONGO_DB_NAME'],
+        event_listeners=[instrumentation.mongo_listener],
+        **mongo_client_options(settings),
+    )
+    return app
+
+
+# Configure from the environment on import too, so `flask run` and scripts importing `app` work unchanged.
+create_app()
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Creates indexes and the sample users (on an empty database). Run once per deploy."""
+    initialize_database()
+
+
+@app.cli.command('compact-activity-buckets')
+@click.option('--days', type=int, default=None, help="Only recompute periods from the last N days (default: all history).")
+def compact_activity_buckets_command(days):
+    """Recomputes the analytics buckets from raw history; safe to schedule (e.g. nightly with --days 14)."""
+    compact_activity_buckets(days)
+    print(f"--- Compacted activity buckets for {'all history' if days is None else f'the last {days} days'}. ---")
+
+
+@app.cli.command('rebuild-student-stats')
+def rebuild_student_stats_command():
+    """Backfills the student_stats rollup collection from raw history."""
+    count = rebuild_student_stats()
+    print(f"--- Rebuilt stats rollups for {count} students. ---")
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Explains every route query and exits non-zero if any falls back to a COLLSCAN."""
+    regressions = []
+    for name, explain_output in route_query_plans():
+        stages = set(plan_stages(explain_output))
+        verdict = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{verdict:>8}  {name}  ({', '.join(sorted(stages))})")
+        if "COLLSCAN" in stages:
+            regressions.append(name)
+
+    if regressions:
+        raise SystemExit(f"!!! QUERY PLAN REGRESSION: {len(regressions)} route queries use COLLSCAN: {', '.join(regressions)} !!!")
+    print("--- All route queries use indexes. ---")
+
+
 if __name__ == '__main__':
+    # Development server only. For production, run wsgi.py under a multi-process server (see wsgi.py).
     try:
-        if users_collection.count_documents({}) == 0:
-            create_sample_users()
-        else:
-            print("--- Sample users already exist in MongoDB. Skipping creation. ---")
+        initialize_database()
     except Exception as e:
-        print(f"!!! CRITICAL MONGODB CONNECTION ERROR: {e} !!!")
-        exit() 
+        raise SystemExit(f"!!! CRITICAL MONGODB CONNECTION ERROR: {e} !!!")
 
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=app.config['DEBUG'])
\ No newline at end of file
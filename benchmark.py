@@ -0,0 +1,422 @@
+# benchmark.py
+# Reproducible load test for the main routes. Seeds a synthetic cohort into mongomock (the
+# default) or a local, empty mongod, then drives the real Flask routes concurrently through
+# the test client and reports p50/p95/p99 latency and throughput per route.
+#
+#   python benchmark.py                                  # mongomock, default cohort
+#   python benchmark.py --mongo-uri mongodb://localhost:27017 --students 2000 --concurrency 32
+#   python benchmark.py --save-baseline benchmark_baseline.json
+#   python benchmark.py --baseline benchmark_baseline.json --max-regression 0.2
+#
+# Notes:
+#   - The code executor is always the stub, so compiler numbers measure this app, not Piston.
+#   - mongomock does not implement pipeline-style updates, so the write-behind rollup updates
+#     fail there. They happen after the response, so route latency is still meaningful, and
+#     the failures are only counted as background errors. Use a mongod for write-path numbers.
+#   - A run with background errors measured an app whose write path did not work, so
+#     --save-baseline refuses it unless --allow-background-errors is given. Baselines record
+#     their backend, and a mongomock baseline is never compared with a mongod run (or back).
+#   - With --mongo-uri the campus360db database must be empty: the benchmark seeds it and
+#     never deletes anything, so point it at a throwaway mongod.
+
+import io
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import datetime
+import threading
+import contextlib
+import collections
+import concurrent.futures
+
+from bson.objectid import ObjectId
+from werkzeug.security import generate_password_hash
+
+from analytics import COHORT_KEY, GRANULARITIES, bucket_key, period_start
+
+BENCH_PASSWORD = "Bench@123"
+ANSWER = ("I would start by clarifying the requirements, then explain the core concept with an example, "
+          "compare the trade-offs, and finish with how I measured the result in a previous project.")
+SCENARIOS = ("login", "student_dashboard", "faculty_dashboard", "interview", "compiler")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Campus360 routes against a synthetic cohort.")
+    parser.add_argument("--mongo-uri", help="Local mongod to seed and use (default: in-memory mongomock).")
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--interviews", type=int, default=3, help="Completed interviews per student.")
+    parser.add_argument("--coding", type=int, default=10, help="Coding runs per student.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=200, help="Iterations of each scenario.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=360)
+    parser.add_argument("--baseline", help="Baseline JSON to compare against.")
+    parser.add_argument("--save-baseline", help="Write this run's results to the given JSON file.")
+    parser.add_argument("--allow-background-errors", action="store_true",
+                        help="Save a baseline even though background writes failed (e.g. a read-latency baseline on mongomock).")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Fail if a route's p95 grows or its req/s drops by more than this fraction of the baseline.")
+    return parser.parse_args(argv)
+
+
+def load_app(mongo_uri):
+    """Imports app.py against the chosen database, with the stub executor and no rate limiting."""
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['CODE_EXECUTOR'] = 'stub'
+    os.environ['EXEC_RATE_LIMIT'] = str(10 ** 9)
+    # Every simulated client shares one address; keep login throttling out of the measurement.
+    os.environ['LOGIN_MAX_PER_IP'] = str(10 ** 9)
+    os.environ['SLOW_REQUEST_SECONDS'] = os.getenv('SLOW_REQUEST_SECONDS', '3600')
+    if mongo_uri:
+        os.environ['MONGO_URI'] = mongo_uri
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            raise SystemExit("!!! mongomock is not installed. Install it or pass --mongo-uri. !!!")
+        import pymongo
+        os.environ['MONGO_URI'] = 'mongodb://benchmark'
+        pymongo.MongoClient = mongomock.MongoClient
+    import app
+    return app
+
+
+# ----------------------------------------------------
+# SEEDING
+# ----------------------------------------------------
+
+def seed_cohort(app, students, interviews, coding, rng):
+    """Inserts a faculty account and `students` students with history, rollups and analytics buckets."""
+    if app.users_collection.estimated_document_count():
+        raise SystemExit("!!! The target database already has users; the benchmark only seeds an empty database. !!!")
+    app.ensure_indexes()
+
+    # One hash for everyone: seeding should not take students × hash cost.
+    password = generate_password_hash(BENCH_PASSWORD, method='pbkdf2:sha256')
+    now = datetime.datetime.utcnow()
+    roles = sorted(app.QUESTION_BANK.tiers)
+    questions = list(app.QUESTION_BANK.by_id.values())
+    languages = list(app.COMPILER_LANGUAGES)
+
+    app.users_collection.insert_one({"username": "bench-faculty@example.com", "password": password, "role": "faculty"})
+    users = [{"username": f"bench{i}@example.com", "password": password, "role": "student"} for i in range(students)]
+    app.users_collection.insert_many(users)
+    buckets = {}
+
+    def add_to_buckets(doc, dimensions, **amounts):
+        for granularity in GRANULARITIES:
+            for dimension, key in dimensions.items():
+                bucket = buckets.setdefault(
+                    (granularity, dimension, key, period_start(doc['timestamp'], granularity)),
+                    bucket_key(granularity, dimension, key, period_start(doc['timestamp'], granularity)),
+                )
+                for field, amount in amounts.items():
+                    bucket[field] = bucket.get(field, 0) + amount
+
+    for user in users:
+        stats = app.new_student_stats(user['_id'], user['username'])
+        daily = {}
+        results, runs = [], []
+        for _ in range(interviews):
+            interview_id = ObjectId()
+            started = now - datetime.timedelta(days=rng.uniform(0, app.ACTIVITY_BUCKET_LIMIT), minutes=30)
+            role = rng.choice(roles)
+            for index, question in enumerate(rng.sample(questions, 10)):
+                score = rng.randint(30, 95)
+                category = rng.choice(list(app.REMEDIAL_RESOURCES))
+                results.append({
+                    "_id": ObjectId(), "student_id": user['_id'], "interview_id": interview_id, "role": role,
+                    "timestamp": started + datetime.timedelta(minutes=2 * index), "question": question['text'],
+                    "concept": question['concept'], "score": score, "communication_feedback": "Benchmark feedback.",
+                    "technical_feedback": "Benchmark feedback.", "improvement_category": category,
+                    "remedial_resource": app.REMEDIAL_RESOURCES[category],
+                })
+                add_to_buckets(results[-1], {"cohort": COHORT_KEY, "student": user['_id'], "role": role, "category": category},
+                               answers=1, score_sum=score)
+            app.interview_reports_collection.insert_one({
+                "_id": interview_id, "student_id": user['_id'], "role": role, "status": "complete",
+                "total_questions": 10, "scored": 10, "answers": [], "started_at": started,
+            })
+        for _ in range(coding):
+            runs.append({
+                "_id": ObjectId(), "student_id": user['_id'],
+                "timestamp": now - datetime.timedelta(days=rng.uniform(0, app.ACTIVITY_BUCKET_LIMIT)),
+                "language": rng.choice(languages), "status": rng.choice(("Success", "Success", "Runtime Error", "Compile Error")),
+                "code_snippet": "print('benchmark')",
+            })
+            add_to_buckets(runs[-1], {"cohort": COHORT_KEY, "student": user['_id']}, coding_runs=1)
+
+        for kind, docs in (("interviews", results), ("coding", runs)):
+            for doc in docs:
+                day = app.activity_day(doc['timestamp'])
+                daily.setdefault(day, {"day": day, "interviews": 0, "coding": 0})[kind] += 1
+            stats[f"{kind}_count"] = len(docs)
+            stats[f"recent_{kind}"] = sorted(docs, key=lambda d: d['timestamp'])[-app.RECENT_ITEMS_LIMIT:]
+        if results:
+            stats["interview_score_sum"] = sum(r['score'] for r in results)
+            stats["avg_score"] = round(stats["interview_score_sum"] / len(results), 1)
+        if results or runs:
+            stats["last_active_at"] = max(d['timestamp'] for d in results + runs)
+        stats["daily_activity"] = sorted(daily.values(), key=lambda b: b['day'])
+
+        if results:
+            app.interview_results_collection.insert_many(results)
+        if runs:
+            app.coding_activity_collection.insert_many(runs)
+        app.student_stats_collection.insert_one(stats)
+    if buckets:
+        app.activity_buckets_collection.insert_many(list(buckets.values()))
+    return users
+
+
+# ----------------------------------------------------
+# SCENARIOS (each returns a list of (route, seconds, ok))
+# ----------------------------------------------------
+
+def logged_in_client(app, user):
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = str(user['_id'])
+        session['role'] = user['role']
+        session['username'] = user['username']
+    return client
+
+
+def timed(samples, route, call, ok=lambda response: response.status_code < 400):
+    started = time.perf_counter()
+    response = call()
+    samples.append((route, time.perf_counter() - started, ok(response)))
+    return response
+
+
+def run_login(app, users, faculty, rng):
+    samples = []
+    user = rng.choice(users)
+    client = app.app.test_client()
+    timed(samples, "POST /login", lambda: client.post('/login', data={"username": user['username'], "password": BENCH_PASSWORD}),
+          ok=lambda r: r.status_code == 302 and 'dashboard' in r.headers.get('Location', ''))
+    return samples
+
+
+def run_student_dashboard(app, users, faculty, rng):
+    samples = []
+    client = logged_in_client(app, rng.choice(users))
+    timed(samples, "GET /student_dashboard", lambda: client.get('/student_dashboard'))
+    return samples
+
+
+def run_faculty_dashboard(app, users, faculty, rng):
+    samples = []
+    client = logged_in_client(app, faculty)
+    timed(samples, "GET /faculty_dashboard", lambda: client.get('/faculty_dashboard'))
+    response = timed(samples, "GET /faculty/roster", lambda: client.get('/faculty/roster'))
+    cursor = response.get_json().get('next_cursor') if response.status_code == 200 else None
+    if cursor:
+        timed(samples, "GET /faculty/roster (page 2)", lambda: client.get('/faculty/roster', query_string={"cursor": cursor}))
+    timed(samples, "GET /faculty/analytics/trends", lambda: client.get('/faculty/analytics/trends'))
+    timed(samples, "GET /faculty/analytics/heatmap", lambda: client.get('/faculty/analytics/heatmap'))
+    return samples
+
+
+def run_interview(app, users, faculty, rng):
+    samples = []
+    client = logged_in_client(app, rng.choice(users))
+    role = rng.choice(sorted(app.QUESTION_BANK.tiers))
+    timed(samples, "POST /start_interview", lambda: client.post('/start_interview', data={"target_role": role}),
+          ok=lambda r: r.status_code == 302 and 'next_question' in r.headers.get('Location', ''))
+    for _ in range(50):
+        started = time.perf_counter()
+        response = client.get('/next_question')
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            # The last call redirects to the dashboard once every answer is in.
+            samples.append(("GET /next_question (finish)", elapsed, 'student_dashboard' in response.headers.get('Location', '')))
+            break
+        samples.append(("GET /next_question", elapsed, True))
+        timed(samples, "POST /process_interview", lambda: client.post('/process_interview', data={"student_answer": ANSWER}),
+              ok=lambda r: r.status_code == 302 and 'next_question' in r.headers.get('Location', ''))
+    return samples
+
+
+JOB_URL_RE = re.compile(r'jobUrl = "([^"]+)"')
+
+
+def run_compiler(app, users, faculty, rng):
+    samples = []
+    client = logged_in_client(app, rng.choice(users))
+    # Distinct code per run, so the result cache does not turn the scenario into cache hits.
+    code = f"print({rng.getrandbits(48)})"
+    response = timed(samples, "POST /compiler", lambda: client.post('/compiler', data={"language": "python", "code_input": code}))
+    match = JOB_URL_RE.search(response.get_data(as_text=True))
+    if not match:
+        samples.append(("GET /compiler/jobs/<job_id>", 0.0, False))
+        return samples
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = timed(samples, "GET /compiler/jobs/<job_id>", lambda: client.get(match.group(1))).get_json() or {}
+        if job.get('state') == 'done':
+            break
+        time.sleep(0.02)
+    return samples
+
+
+RUNNERS = {
+    "login": run_login,
+    "student_dashboard": run_student_dashboard,
+    "faculty_dashboard": run_faculty_dashboard,
+    "interview": run_interview,
+    "compiler": run_compiler,
+}
+
+
+# ----------------------------------------------------
+# DRIVER AND REPORTING
+# ----------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(app, name, users, faculty, iterations, concurrency, seed):
+    """Runs `iterations` of one scenario on `concurrency` threads; returns per-route samples and wall time."""
+    runner = RUNNERS[name]
+    counter = iter(range(iterations))
+    lock = threading.Lock()
+    samples = []
+
+    def worker(worker_index):
+        rng = random.Random(seed * 1000 + worker_index)
+        local = []
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            try:
+                local.extend(runner(app, users, faculty, rng))
+            except Exception as e:
+                local.append((f"{name} (exception)", 0.0, False))
+                print(f"!!! BENCHMARK: {name} raised {type(e).__name__}: {e} !!!")
+        return local
+
+    started = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for local in pool.map(worker, range(concurrency)):
+            samples.extend(local)
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, wall_seconds):
+    by_route = collections.defaultdict(list)
+    errors = collections.Counter()
+    for route, seconds, ok in samples:
+        by_route[route].append(seconds)
+        if not ok:
+            errors[route] += 1
+    results = {}
+    for route, values in by_route.items():
+        values.sort()
+        results[route] = {
+            "count": len(values),
+            "errors": errors[route],
+            "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+            "req_per_s": round(len(values) / wall_seconds, 1) if wall_seconds else 0.0,
+        }
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """Prints the change against the baseline; returns the routes that regressed beyond `max_regression`."""
+    regressions = []
+    print(f"\n{'route':<36}{'p95 now':>10}{'p95 base':>10}{'change':>9}{'req/s now':>11}{'req/s base':>11}{'change':>9}")
+    for route, now in sorted(results.items()):
+        base = baseline.get(route)
+        if not base:
+            print(f"{route:<36}{now['p95_ms']:>10.2f}{'-':>10}{'new':>9}{now['req_per_s']:>11.1f}{'-':>11}{'new':>9}")
+            continue
+        p95_change = (now['p95_ms'] - base['p95_ms']) / base['p95_ms'] if base['p95_ms'] else 0.0
+        rps_change = (now['req_per_s'] - base['req_per_s']) / base['req_per_s'] if base['req_per_s'] else 0.0
+        flag = p95_change > max_regression or rps_change < -max_regression
+        print(f"{route:<36}{now['p95_ms']:>10.2f}{base['p95_ms']:>10.2f}{p95_change:>+9.0%}"
+              f"{now['req_per_s']:>11.1f}{base['req_per_s']:>11.1f}{rps_change:>+9.0%}{'  <-- REGRESSION' if flag else ''}")
+        if flag:
+            regressions.append(route)
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in RUNNERS]
+    if unknown:
+        raise SystemExit(f"!!! Unknown scenarios: {', '.join(unknown)}. Choose from: {', '.join(SCENARIOS)} !!!")
+
+    rng = random.Random(args.seed)
+    app = load_app(args.mongo_uri)
+    seed_started = time.perf_counter()
+    users = seed_cohort(app, args.students, args.interviews, args.coding, rng)
+    faculty = app.users_collection.find_one({"role": "faculty"})
+    print(f"--- Seeded {args.students} students × {args.interviews} interviews × {args.coding} coding runs "
+          f"into {'mongod' if args.mongo_uri else 'mongomock'} in {time.perf_counter() - seed_started:.1f}s ---")
+
+    results = {}
+    background_errors = 0
+    for name in scenarios:
+        # Route code and background threads print their errors; keep them out of the report but count them.
+        captured = io.StringIO()
+        with contextlib.redirect_stdout(captured):
+            samples, wall = run_scenario(app, name, users, faculty, args.iterations, args.concurrency, args.seed)
+            app.write_buffer.flush()
+        background_errors += sum(1 for line in captured.getvalue().splitlines() if line.startswith("!!!"))
+        results.update(summarize(samples, wall))
+        print(f"--- {name}: {args.iterations} iterations in {wall:.2f}s ---")
+
+    print(f"\n{'route':<36}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for route, row in sorted(results.items()):
+        print(f"{route:<36}{row['count']:>7}{row['errors']:>8}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['req_per_s']:>9.1f}")
+    if background_errors:
+        print(f"\n--- {background_errors} background errors were logged during the run"
+              f"{' (expected with mongomock, see notes at the top of benchmark.py)' if not args.mongo_uri else ''}. ---")
+
+    report = {
+        "config": {key: getattr(args, key) for key in ("students", "interviews", "coding", "concurrency", "iterations", "seed")},
+        "backend": "mongod" if args.mongo_uri else "mongomock",
+        "python": sys.version.split()[0],
+        "background_errors": background_errors,
+        "results": results,
+    }
+    if args.save_baseline:
+        if background_errors and not args.allow_background_errors:
+            raise SystemExit(f"!!! Baseline not saved: {background_errors} background writes failed, so the write path was not measured. "
+                             f"Use a mongod (--mongo-uri) or pass --allow-background-errors. !!!")
+        with open(args.save_baseline, "w") as handle:
+            json.dump(report, handle, indent=2, sort_keys=True)
+        print(f"--- Baseline written to {args.save_baseline} ---")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if baseline.get('backend') != report['backend']:
+            raise SystemExit(f"!!! The baseline was recorded on {baseline.get('backend')} and this run used {report['backend']}; they are not comparable. !!!")
+        if baseline.get('config') != report['config']:
+            print("--- Note: the baseline was recorded with a different cohort or load. ---")
+        if bool(baseline.get('background_errors')) != bool(background_errors):
+            print("--- Note: only one of the two runs had failing background writes; write-heavy routes may not be comparable. ---")
+        regressions = compare(results, baseline.get('results', {}), args.max_regression)
+        if regressions:
+            raise SystemExit(f"!!! BENCHMARK REGRESSION in {len(regressions)} routes: {', '.join(regressions)} !!!")
+        print("--- No regressions beyond the allowed margin. ---")
+
+
+if __name__ == '__main__':
+    main()
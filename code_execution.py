@@ -0,0 +1,342 @@
+# code_execution.py
+# Execution gateway for the /compiler route: submissions are queued and run by a small
+# pool of background workers, so Flask request threads never wait on remote execution.
+
+import os
+import threading
+import queue
+import time
+import uuid
+import hashlib
+import datetime
+import collections
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from sandbox import LocalExecutor
+
+PISTON_API_URL = "https://emkc.org/api/v2/piston/execute"
+
+
+class ExecutionRejected(Exception):
+    """Raised when a submission is refused because of rate limiting or a full queue."""
+
+
+# ----------------------------------------------------
+# EXECUTORS (pluggable backends)
+# ----------------------------------------------------
+
+class PistonExecutor:
+    """Runs code on the Piston API over a persistent, pooled HTTP session."""
+
+    def __init__(self, api_url=PISTON_API_URL, pool_size=16, timeout=15):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def execute(self, language, version, code, stdin=""):
+        payload = {"language": language, "version": version, "files": [{"content": code}], "stdin": stdin}
+        try:
+            response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+            result = response.json() if response.ok else None
+        except (requests.exceptions.RequestException, ValueError) as e:
+            return {"output": f"API Connection Error: ({e})", "status": None}
+
+        # Only an answer that actually compiled or ran gets a status; everything else (rate limits,
+        # server errors, unknown runtimes, killed compilers) is transient and must not be cached.
+        if not isinstance(result, dict):
+            return {"output": f"Execution service error (HTTP {response.status_code}).", "status": None}
+        compiled, run = result.get('compile'), result.get('run')
+        if isinstance(compiled, dict) and compiled.get('code') not in (0, None):
+            return {"output": compiled.get('output') or "Compile Error", "status": "Compile Error"}
+        if not isinstance(run, dict) or (isinstance(compiled, dict) and compiled.get('code') is None):
+            return {"output": result.get('message') or "Execution failed or timed out.", "status": None}
+        return {"output": run.get('output') or "", "status": "Success" if run.get('code') == 0 else "Runtime Error"}
+
+
+class StubExecutor:
+    """Returns a canned result without running anything. Used for tests and benchmarks."""
+
+    def __init__(self, output="Hello World\n", status="Success", delay=0.0):
+        self.output = output
+        self.status = status
+        self.delay = delay
+
+    def execute(self, language, version, code, stdin=""):
+        if self.delay:
+            time.sleep(self.delay)
+        return {"output": self.output, "status": self.status}
+
+
+EXECUTORS = {
+    "piston": PistonExecutor,
+    "stub": StubExecutor,
+    "local": LocalExecutor,
+}
+
+
+def build_executor(name):
+    """Instantiates the executor registered under `name` (see EXECUTORS)."""
+    if name not in EXECUTORS:
+        raise ValueError(f"Unknown code executor '{name}'. Choose one of: {', '.join(EXECUTORS)}")
+    return EXECUTORS[name]()
+
+
+# ----------------------------------------------------
+# RESULT CACHE (content-addressed, TTL + LRU)
+# ----------------------------------------------------
+
+class ResultCache:
+    """
+    Caches execution results by (language, version, source hash, stdin). Entries expire
+    after `ttl` seconds and the least recently used entry is evicted beyond `max_entries`.
+    Only outcomes that depend on the source alone are cached (see CACHEABLE_STATUSES).
+    """
+
+    CACHEABLE_STATUSES = ("Success", "Compile Error")
+
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(language, version, code, stdin=""):
+        digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        stdin_digest = hashlib.sha256(stdin.encode("utf-8")).hexdigest()
+        return (language, version, digest, stdin_digest)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, result):
+        if result.get('status') not in self.CACHEABLE_STATUSES:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# ----------------------------------------------------
+# JOB STORES (where finished results wait to be polled)
+# ----------------------------------------------------
+
+JOB_FIELDS = ("id", "user_id", "state", "output", "status", "metrics", "cached")
+
+
+class InMemoryJobStore:
+    """
+    Process-local job results with a TTL. Only correct with a single worker process: a poll
+    that reaches another process will not find the job.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Ordered by last write; with one TTL for all entries that is also expiry order.
+        self._jobs = collections.OrderedDict()
+
+    def save(self, job):
+        now = time.monotonic()
+        with self._lock:
+            while self._jobs and next(iter(self._jobs.values()))[0] < now:
+                self._jobs.popitem(last=False)
+            self._jobs[job['id']] = (now + self.ttl, {field: job[field] for field in JOB_FIELDS})
+
+    def update(self, job_id, fields):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is not None:
+                entry[1].update(fields)
+                self._jobs[job_id] = (time.monotonic() + self.ttl, entry[1])
+                self._jobs.move_to_end(job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry[0] < time.monotonic():
+                return None
+            return dict(entry[1])
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+
+class MongoJobStore:
+    """Shares job results across worker processes through a MongoDB collection with a TTL index."""
+
+    def __init__(self, collection, ttl=300):
+        self.collection = collection
+        self.ttl = ttl
+
+    def _expires_at(self):
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl)
+
+    def ensure_indexes(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0, name="expires_at_ttl")
+
+    def save(self, job):
+        doc = {field: job[field] for field in JOB_FIELDS if field != "id"}
+        self.collection.insert_one(dict(doc, _id=job['id'], expires_at=self._expires_at()))
+
+    def update(self, job_id, fields):
+        self.collection.update_one({"_id": job_id}, {"$set": dict(fields, expires_at=self._expires_at())})
+
+    def get(self, job_id):
+        doc = self.collection.find_one({"_id": job_id, "expires_at": {"$gt": datetime.datetime.utcnow()}}, {"expires_at": 0})
+        if doc is None:
+            return None
+        doc['id'] = doc.pop('_id')
+        return doc
+
+    def delete(self, job_id):
+        self.collection.delete_one({"_id": job_id})
+
+
+# ----------------------------------------------------
+# GATEWAY (bounded queue, worker pool, rate limiting)
+# ----------------------------------------------------
+
+class ExecutionGateway:
+    """
+    Accepts code submissions, runs them on background worker threads and keeps the result
+    until it is polled. The queue is bounded and each user is limited to `rate_limit` runs
+    per `rate_window` seconds; both refusals surface as ExecutionRejected. Submissions that
+    hit `cache` complete immediately without touching the executor, but still count towards
+    the rate limit, since every completed run is logged as coding activity.
+    `on_complete(job)` is called once a job has finished. Results are kept in `job_store`
+    (in memory by default; MongoJobStore when several worker processes serve polls).
+    """
+
+    def __init__(self, executor, max_workers=8, max_queue=200, rate_limit=10, rate_window=60, job_ttl=300, on_complete=None, cache=None, job_store=None):
+        self.executor = executor
+        self.cache = cache
+        self.max_workers = max_workers
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.job_store = job_store or InMemoryJobStore(job_ttl)
+        self.on_complete = on_complete
+        self._max_queue = max_queue
+        self._lock = threading.Lock()
+        self._recent_runs = collections.defaultdict(collections.deque)
+        self._queue = None
+        self._pid = None
+
+    def _ensure_workers(self):
+        # Threads do not survive a fork, so a new worker process starts its own pool.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self._max_queue)
+            for _ in range(self.max_workers):
+                threading.Thread(target=self._worker, daemon=True).start()
+            self._pid = os.getpid()
+
+    def _check_rate_limit(self, user_id, now):
+        runs = self._recent_runs[user_id]
+        while runs and runs[0] <= now - self.rate_window:
+            runs.popleft()
+        if len(runs) >= self.rate_limit:
+            raise ExecutionRejected(f"Rate limit reached: at most {self.rate_limit} runs every {self.rate_window} seconds.")
+        runs.append(now)
+
+    def submit(self, user_id, language, version, code, stdin="", username=None):
+        """Queues a run and returns its job id without waiting for the result."""
+        self._ensure_workers()
+        now = time.monotonic()
+        job = {
+            "id": uuid.uuid4().hex, "user_id": user_id, "username": username, "language": language, "version": version,
+            "code": code, "stdin": stdin, "state": "queued", "output": None, "status": None, "metrics": None,
+            "cached": False, "submitted_at": now, "finished_at": None,
+        }
+
+        with self._lock:
+            self._check_rate_limit(user_id, now)
+
+        cached = self.cache.get(ResultCache.key(language, version, code, stdin)) if self.cache else None
+        if cached is not None:
+            job.update(output=cached['output'], status=cached['status'], metrics=cached.get('metrics'), cached=True, state="done", finished_at=now)
+            self.job_store.save(job)
+            self._notify(job)
+            return job['id']
+
+        # Stored before it is queued, so a fast worker's update always finds it.
+        self.job_store.save(job)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.job_store.delete(job['id'])
+            with self._lock:
+                self._recent_runs[user_id].pop()
+            raise ExecutionRejected("The code runner is busy right now. Please try again in a moment.")
+        return job['id']
+
+    def poll(self, job_id, user_id):
+        """Returns the public view of a job, or None if it is unknown or belongs to someone else."""
+        job = self.job_store.get(job_id)
+        if job is None or job['user_id'] != user_id:
+            return None
+        return {field: job[field] for field in JOB_FIELDS if field != "user_id"}
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job['state'] = "running"
+            self._store_update(job, {"state": "running"})
+            try:
+                result = self.executor.execute(job['language'], job['version'], job['code'], job['stdin'])
+            except Exception as e:
+                result = {"output": f"Execution backend error: ({e})", "status": None}
+
+            if self.cache:
+                self.cache.put(ResultCache.key(job['language'], job['version'], job['code'], job['stdin']), result)
+            job.update(output=result['output'], status=result['status'], metrics=result.get('metrics'), state="done", finished_at=time.monotonic())
+            self._store_update(job, {field: job[field] for field in ("state", "output", "status", "metrics")})
+
+            self._notify(job)
+            self._queue.task_done()
+
+    def _store_update(self, job, fields):
+        try:
+            self.job_store.update(job['id'], fields)
+        except Exception as e:
+            print(f"!!! Failed to store code execution {job['id']}: {e} !!!")
+
+    def _notify(self, job):
+        if self.on_complete:
+            try:
+                self.on_complete(job)
+            except Exception as e:
+                print(f"!!! Failed to record code execution {job['id']}: {e} !!!")
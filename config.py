@@ -0,0 +1,49 @@
+# config.py
+# Explicit application settings, read from the environment (and .env) with defaults.
+# create_app() in app.py takes these plus any overrides passed to it.
+
+import os
+
+# Config keys that map onto MongoClient keyword arguments.
+MONGO_CLIENT_OPTIONS = {
+    "MONGO_MAX_POOL_SIZE": "maxPoolSize",
+    "MONGO_MIN_POOL_SIZE": "minPoolSize",
+    "MONGO_MAX_IDLE_TIME_MS": "maxIdleTimeMS",
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": "waitQueueTimeoutMS",
+    "MONGO_CONNECT_TIMEOUT_MS": "connectTimeoutMS",
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": "serverSelectionTimeoutMS",
+    "MONGO_SOCKET_TIMEOUT_MS": "socketTimeoutMS",
+    "MONGO_READ_PREFERENCE": "readPreference",
+    "MONGO_APP_NAME": "appname",
+}
+
+
+def load_config(overrides=None):
+    """Returns the settings dict; `overrides` wins over the environment."""
+    config = {
+        "SECRET_KEY": os.getenv('SECRET_KEY'),
+        "MONGO_URI": os.getenv('MONGO_URI'),
+        "MONGO_DB_NAME": os.getenv('MONGO_DB_NAME', 'campus360db'),
+        # Connections per worker process. Size it to the worker's thread count plus the
+        # background threads (write-behind flusher, scoring and compiler workers).
+        "MONGO_MAX_POOL_SIZE": int(os.getenv('MONGO_MAX_POOL_SIZE', 50)),
+        "MONGO_MIN_POOL_SIZE": int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+        "MONGO_MAX_IDLE_TIME_MS": int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000)),
+        # How long a request waits for a free pooled connection before failing.
+        "MONGO_WAIT_QUEUE_TIMEOUT_MS": int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 2000)),
+        "MONGO_CONNECT_TIMEOUT_MS": int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+        "MONGO_SERVER_SELECTION_TIMEOUT_MS": int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        "MONGO_SOCKET_TIMEOUT_MS": int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 20000)),
+        # e.g. "secondaryPreferred" to serve reads from replica-set secondaries.
+        "MONGO_READ_PREFERENCE": os.getenv('MONGO_READ_PREFERENCE', 'primary'),
+        "MONGO_APP_NAME": os.getenv('MONGO_APP_NAME', 'campus360'),
+        "READINESS_TIMEOUT_MS": int(os.getenv('READINESS_TIMEOUT_MS', 1000)),
+        "DEBUG": os.getenv('FLASK_DEBUG', 'false').lower() in ('1', 'true'),
+    }
+    config.update(overrides or {})
+    return config
+
+
+def mongo_client_options(config):
+    """The MongoClient keyword arguments named by `config`."""
+    return {option: config[key] for key, option in MONGO_CLIENT_OPTIONS.items() if config.get(key) is not None}
@@ -0,0 +1,81 @@
+# dashboard_cache.py
+# Per-student cache of the dashboard's query results and rendered activity fragment, so a
+# student refreshing the page costs neither a rollup lookup nor a template re-render until
+# one of their own writes (an interview answer or a compiler run) lands in MongoDB.
+
+import time
+import threading
+import collections
+
+
+class DashboardCache:
+    """
+    Process-local LRU cache keyed by student ID, bounded by `max_entries` and by the
+    approximate size of the cached values (`max_bytes`). Entries also expire after `ttl`
+    seconds, which bounds how stale another worker process's copy can get, since
+    invalidation only reaches the process that performed the write.
+
+    Fills are guarded by a per-student generation counter: `generation()` is read before
+    querying, and `put()` discards the value if the student was invalidated in between,
+    so a fill that raced a write can never re-cache the pre-write data.
+    """
+
+    def __init__(self, max_entries=5000, max_bytes=32 * 1024 * 1024, ttl=60):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._generations = {}
+        self._clock = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self, key):
+        with self._lock:
+            return self._generations.get(key, 0)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._evict(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, size, generation):
+        """Caches `value` (about `size` bytes) unless `key` was invalidated since `generation` was read."""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generations.get(key, 0) != generation:
+                return
+            if key in self._entries:
+                self._evict(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._clock += 1
+            self._generations[key] = self._clock
+            if key in self._entries:
+                self._evict(key)
+            # Generations only matter while a fill may be in flight; forget long-settled ones.
+            if len(self._generations) > 4 * self.max_entries:
+                horizon = self._clock - 2 * self.max_entries
+                self._generations = {k: g for k, g in self._generations.items() if g > horizon}
+
+    def _evict(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
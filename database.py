@@ -0,0 +1,90 @@
+# database.py
+# Lazily created, fork-safe MongoDB access. Importing the app never touches the database:
+# the MongoClient is built on first use, and again in every process forked after that, so
+# each WSGI worker gets its own connection pool instead of a copy of the parent's.
+
+import os
+import threading
+
+import pymongo
+from pymongo import MongoClient
+
+
+class MongoConnection:
+    """
+    Holds the client settings and builds the MongoClient on demand, once per process.
+    `collection(name)` returns a handle that can be created at import and used like a
+    pymongo Collection.
+    """
+
+    def __init__(self, uri=None, db_name="campus360db", event_listeners=(), **client_options):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self.configure(uri, db_name, event_listeners, **client_options)
+
+    def configure(self, uri, db_name, event_listeners=(), **client_options):
+        """Replaces the settings; the next access builds a client with them."""
+        with self._lock:
+            self.uri = uri
+            self.db_name = db_name
+            self.event_listeners = list(event_listeners)
+            self.client_options = client_options
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    @property
+    def client(self):
+        if self._pid == os.getpid():
+            return self._client
+        with self._lock:
+            if self._pid != os.getpid():
+                # A client inherited across fork must not be used (or closed) by the child.
+                self._client = MongoClient(self.uri, event_listeners=self.event_listeners, **self.client_options)
+                self._pid = os.getpid()
+            return self._client
+
+    @property
+    def db(self):
+        return self.client[self.db_name]
+
+    def collection(self, name):
+        return LazyCollection(self, name)
+
+    def ping(self, timeout_ms=1000):
+        """Round-trips to the server; raises if it cannot be reached within `timeout_ms`."""
+        with pymongo.timeout(timeout_ms / 1000):
+            self.db.command("ping")
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+
+class LazyCollection:
+    """Forwards every attribute to the named collection of the current process's client."""
+
+    __slots__ = ("_connection", "_name")
+
+    def __init__(self, connection, name):
+        self._connection = connection
+        self._name = name
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def full_name(self):
+        return f"{self._connection.db_name}.{self._name}"
+
+    def __getattr__(self, attribute):
+        return getattr(self._connection.db[self._name], attribute)
+
+    def __repr__(self):
+        return f"LazyCollection({self.full_name!r})"
@@ -0,0 +1,85 @@
+# exports.py
+# Streaming serializers for faculty data exports. Rows are pulled from a Mongo cursor and
+# emitted in ~64KB chunks, so memory use does not depend on how many rows are exported.
+
+import io
+import csv
+import json
+import datetime
+
+from bson.objectid import ObjectId
+
+EXPORT_FIELDS = {
+    "interview_results": ["student_id", "interview_id", "timestamp", "question", "concept", "score", "improvement_category"],
+    "coding_activity": ["student_id", "timestamp", "language", "status", "code_snippet"],
+}
+CHUNK_BYTES = 64 * 1024
+# Spreadsheets evaluate cells starting with these as formulas (CSV injection).
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def export_value(value):
+    """Converts BSON values into plain CSV/JSON friendly values."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+
+def csv_safe(value):
+    """Prefixes student-supplied text that a spreadsheet would run as a formula with a quote."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_rows(sources, usernames):
+    """
+    Yields one flat dict per document from `sources`, a list of (dataset, cursor) pairs,
+    adding the dataset name and the student's username.
+    """
+    for dataset, cursor in sources:
+        fields = EXPORT_FIELDS[dataset]
+        for doc in cursor:
+            row = {"dataset": dataset, "username": usernames.get(doc.get('student_id'), "")}
+            row.update((field, export_value(doc.get(field))) for field in fields)
+            yield row
+
+
+def stream_jsonl(rows):
+    buffer = []
+    size = 0
+    first = True
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES or first:
+            # The first row goes out on its own so the download starts immediately.
+            first = False
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_csv(rows, datasets):
+    header = ["dataset", "username"]
+    for dataset in datasets:
+        header += [field for field in EXPORT_FIELDS[dataset] if field not in header]
+
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=header, extrasaction="ignore")
+    writer.writeheader()
+    yield out.getvalue()
+    out.seek(0)
+    out.truncate()
+    for row in rows:
+        writer.writerow({field: csv_safe(value) for field, value in row.items()})
+        if out.tell() >= CHUNK_BYTES:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue()
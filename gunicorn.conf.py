@@ -0,0 +1,27 @@
+# gunicorn.conf.py
+# Settings for `gunicorn -c gunicorn.conf.py wsgi:application`; see wsgi.py.
+
+import os
+import multiprocessing
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Interview state and compiler results must be visible to every worker (wsgi.py defaults
+# both stores to MongoDB); refuse to start several workers with a process-local store.
+if workers > 1:
+    for setting in ('INTERVIEW_STORE', 'EXEC_JOB_STORE'):
+        if os.getenv(setting, 'mongo') == 'memory':
+            raise SystemExit(f"!!! {setting}=memory keeps state inside one process; use a shared store or WEB_CONCURRENCY=1 (workers={workers}). !!!")
+
+# Safe because nothing connects or starts threads at import; each worker does that lazily.
+preload_app = True
+
+# Recycle workers periodically to bound memory growth from per-process caches.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 500))
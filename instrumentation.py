@@ -0,0 +1,277 @@
+# instrumentation.py
+# Request-level performance metrics: route latency, MongoDB commands per request (through
+# pymongo command monitoring), template render time and compiler backend calls. Metrics
+# are kept in process and exposed in the Prometheus text format; requests slower than a
+# threshold are logged together with the queries they issued.
+
+import time
+import bisect
+import threading
+import collections
+
+from flask import request, g, before_render_template, template_rendered
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Label values come from a fixed set, so clients cannot grow the registry with made-up
+# methods or languages; anything else is reported as "other".
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+
+def bounded_label(value, allowed):
+    return value if value in allowed else "other"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled histograms, counters and gauges."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, kind, text, buckets=None):
+        self._help[name] = (kind, text, buckets)
+
+    def observe(self, name, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(self._help[name][2] or LATENCY_BUCKETS)
+            series[key].observe(value)
+
+    def inc(self, name, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name, labels, value):
+        """Sets a gauge, or a counter whose running total is kept by another component."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters.setdefault(name, {})[key] = value
+
+    def add_collector(self, collect):
+        """Registers `collect(registry)`, called before every render to set() values kept elsewhere."""
+        self._collectors.append(collect)
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        for collect in self._collectors:
+            collect(self)
+        lines = []
+        with self._lock:
+            for name, (kind, text, _) in self._help.items():
+                lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+                if kind in ("counter", "gauge"):
+                    for key, value in sorted(self._counters.get(name, {}).items()):
+                        lines.append(f"{name}{_labels(key)} {value}")
+                    continue
+                for key, hist in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(key + (('le', repr(float(bound))),))} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(key + (('le', '+Inf'),))} {hist.count}")
+                    lines.append(f"{name}_sum{_labels(key)} {hist.total:.6f}")
+                    lines.append(f"{name}_count{_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key):
+    if not key:
+        return ""
+    escaped = (name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"' for name, value in key)
+    return "{" + ",".join(escaped) + "}"
+
+
+def command_shape(command_name, command):
+    """
+    Summarizes a Mongo command for the slow-request log: collection plus the field names
+    it filters or groups on. Values are left out so no credentials or answers are logged.
+    """
+    target = command.get(command_name)
+    target = target if isinstance(target, str) else ""
+    if command_name == "find":
+        detail = "filter " + _keys(command.get('filter', {}))
+        if command.get('sort'):
+            detail += " sort " + _keys(command['sort'])
+    elif command_name == "aggregate":
+        detail = "pipeline " + ",".join(next(iter(stage), "?") for stage in command.get('pipeline', []))
+    elif command_name in ("update", "delete"):
+        ops = command.get('updates' if command_name == "update" else 'deletes', [])
+        detail = f"{len(ops)} ops on " + (_keys(ops[0].get('q', {})) if ops else "{}")
+    elif command_name == "insert":
+        detail = f"{len(command.get('documents', []))} docs"
+    elif command_name == "findAndModify":
+        detail = "query " + _keys(command.get('query', {}))
+    else:
+        detail = ""
+    return f"{command_name} {target} {detail}".strip()
+
+
+def _keys(document):
+    return "{" + ",".join(document) + "}" if isinstance(document, dict) else "{}"
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Times every Mongo command. Sync pymongo publishes events on the thread that issued the
+    command, so commands sent while handling a request are attributed to that request;
+    the rest (write-behind flushes, scoring workers) are recorded as background work.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self._local = threading.local()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def begin_request(self):
+        self._local.commands = []
+
+    def end_request(self):
+        commands, self._local.commands = getattr(self._local, 'commands', None) or [], None
+        return commands
+
+    def started(self, event):
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = command_shape(event.command_name, event.command)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+    def _finish(self, event, outcome):
+        with self._lock:
+            shape = self._pending.pop((event.connection_id, event.request_id), event.command_name)
+        seconds = event.duration_micros / 1e6
+        commands = getattr(self._local, 'commands', None)
+        self.registry.observe("mongo_command_duration_seconds", {
+            "command": event.command_name, "outcome": outcome,
+            "context": "request" if commands is not None else "background",
+        }, seconds)
+        if commands is not None:
+            commands.append((shape, seconds))
+
+
+class TimedExecutor:
+    """Wraps a code execution backend and records how long each call to it takes."""
+
+    def __init__(self, executor, registry, languages=()):
+        self.executor = executor
+        self.registry = registry
+        self.name = type(executor).__name__
+        self.languages = frozenset(languages)
+
+    def execute(self, language, version, code, stdin=""):
+        started = time.perf_counter()
+        result = self.executor.execute(language, version, code, stdin)
+        self.registry.observe("compiler_call_duration_seconds", {
+            "executor": self.name, "language": bounded_label(language, self.languages), "status": result.get('status') or "error",
+        }, time.perf_counter() - started)
+        return result
+
+
+class Instrumentation:
+    """
+    Hooks a Flask app, its MongoClient (via `mongo_listener`) and template rendering into
+    one MetricsRegistry. Requests slower than `slow_request_seconds` are printed with
+    each Mongo command they ran; the last `slow_log_size` of them are kept for inspection.
+    """
+
+    def __init__(self, slow_request_seconds=0.5, slow_log_size=100):
+        self.slow_request_seconds = slow_request_seconds
+        self.registry = MetricsRegistry()
+        self.mongo_listener = MongoCommandListener(self.registry)
+        self.slow_requests = collections.deque(maxlen=slow_log_size)
+        self._describe()
+
+    def _describe(self):
+        describe = self.registry.describe
+        describe("http_request_duration_seconds", "histogram", "Route latency, by route, method and status.")
+        describe("http_request_mongo_commands", "histogram", "Mongo commands issued per request, by route.", COUNT_BUCKETS)
+        describe("http_request_mongo_seconds", "histogram", "Time spent in Mongo per request, by route.")
+        describe("mongo_command_duration_seconds", "histogram", "Mongo command latency, by command name.")
+        describe("template_render_duration_seconds", "histogram", "Jinja render time, by template.")
+        describe("compiler_call_duration_seconds", "histogram", "Code execution backend call latency.")
+        describe("slow_requests_total", "counter", "Requests slower than the slow-request threshold, by route.")
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+    def timed_executor(self, executor, languages=()):
+        """Wraps `executor`; only languages in `languages` get their own label value."""
+        return TimedExecutor(executor, self.registry, languages)
+
+    def _before_request(self):
+        g.instrumentation_started = time.perf_counter()
+        g.template_starts = []
+        self.mongo_listener.begin_request()
+
+    def _teardown_request(self, error=None):
+        started = g.pop('instrumentation_started', None)
+        commands = self.mongo_listener.end_request()
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        status = "500" if error else str(getattr(g, 'response_status', ""))
+        mongo_seconds = sum(seconds for _, seconds in commands)
+
+        method = bounded_label(request.method, HTTP_METHODS)
+        self.registry.observe("http_request_duration_seconds", {"route": route, "method": method, "status": status}, elapsed)
+        self.registry.observe("http_request_mongo_commands", {"route": route}, len(commands))
+        self.registry.observe("http_request_mongo_seconds", {"route": route}, mongo_seconds)
+
+        if elapsed >= self.slow_request_seconds:
+            self.registry.inc("slow_requests_total", {"route": route})
+            entry = {
+                "route": route, "method": request.method, "path": request.path, "seconds": round(elapsed, 4),
+                "mongo_seconds": round(mongo_seconds, 4),
+                "queries": [{"command": shape, "ms": round(seconds * 1000, 2)} for shape, seconds in commands],
+            }
+            self.slow_requests.append(entry)
+            print(f"--- SLOW REQUEST {request.method} {request.path} took {elapsed * 1000:.0f} ms "
+                  f"({len(commands)} Mongo commands, {mongo_seconds * 1000:.0f} ms) ---")
+            for query in sorted(entry['queries'], key=lambda q: -q['ms']):
+                print(f"    {query['ms']:>8.2f} ms  {query['command']}")
+
+    def _after_request(self, response):
+        g.response_status = response.status_code
+        return response
+
+    def _before_render(self, sender, template, context, **extra):
+        if 'template_starts' in g:
+            g.template_starts.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        if g.get('template_starts'):
+            self.registry.observe("template_render_duration_seconds", {"template": template.name or "string"},
+                                  time.perf_counter() - g.template_starts.pop())
@@ -0,0 +1,87 @@
+# interview_store.py
+# Server-side storage for in-progress interviews. The Flask session only carries an opaque
+# token; the question IDs and progress live here.
+
+import json
+import time
+import threading
+import datetime
+import collections
+
+
+class InMemoryInterviewStore:
+    """
+    Process-local LRU store with a per-entry TTL. Fast and dependency free, but each worker
+    process has its own copy, so multi-process deployments should use a shared backend
+    (or sticky sessions).
+    """
+
+    def __init__(self, max_entries=10000, ttl=3 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return dict(entry[1])
+
+    def save(self, token, state):
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, dict(state))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, token):
+        with self._lock:
+            self._entries.pop(token, None)
+
+
+class MongoInterviewStore:
+    """Shares interview state across worker processes through a MongoDB collection with a TTL index."""
+
+    def __init__(self, collection, ttl=3 * 3600):
+        self.collection = collection
+        self.ttl = ttl
+
+    def ensure_indexes(self):
+        self.collection.create_index("expires_at", expireAfterSeconds=0, name="expires_at_ttl")
+
+    def get(self, token):
+        doc = self.collection.find_one({"_id": token, "expires_at": {"$gt": datetime.datetime.utcnow()}})
+        return doc['state'] if doc else None
+
+    def save(self, token, state):
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl)
+        self.collection.replace_one({"_id": token}, {"_id": token, "state": state, "expires_at": expires_at}, upsert=True)
+
+    def delete(self, token):
+        self.collection.delete_one({"_id": token})
+
+
+class RedisInterviewStore:
+    """Shares interview state through Redis (or any Redis-protocol server). Requires the `redis` package."""
+
+    def __init__(self, url, ttl=3 * 3600, prefix="interview:"):
+        import redis  # Optional dependency, only needed when this backend is selected.
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, token):
+        raw = self.client.get(self.prefix + token)
+        return json.loads(raw) if raw else None
+
+    def save(self, token, state):
+        self.client.set(self.prefix + token, json.dumps(state), ex=self.ttl)
+
+    def delete(self, token):
+        self.client.delete(self.prefix + token)
@@ -0,0 +1,47 @@
+# mastery.py
+# Per-student concept mastery: an exponential moving average of interview scores per
+# concept, kept as a small {concept: score} map on the student's student_stats document.
+# Each scored answer moves its own concept towards the score; if the analyzer flagged a
+# different improvement_category, that category is moved towards a low score too. The
+# question bank uses the map to weight question sampling towards weak concepts.
+
+MASTERY_ALPHA = 0.3       # Weight of the newest answer in the moving average.
+MASTERY_PRIOR = 50.0      # Assumed mastery of a concept the student has not been asked yet.
+WEAK_SIGNAL_SCORE = 40.0  # Observation recorded for a flagged improvement_category.
+
+
+def mastery_observations(concept, category, score):
+    """The (concept, observed score) pairs one scored answer contributes."""
+    observations = [(concept, score)]
+    if category and category != concept:
+        observations.append((category, min(score, WEAK_SIGNAL_SCORE)))
+    return observations
+
+
+def apply_mastery(mastery, concept, category, score):
+    """Updates a mastery map in place (used when rebuilding it from history)."""
+    for key, observed in mastery_observations(concept, category, score):
+        previous = mastery.get(key, MASTERY_PRIOR)
+        mastery[key] = round(MASTERY_ALPHA * observed + (1 - MASTERY_ALPHA) * previous, 1)
+    return mastery
+
+
+def mastery_update_fields(concept, category, score):
+    """
+    Aggregation-pipeline $set fields applying the same update as apply_mastery(), for use in
+    the student_stats pipeline upsert. Concept names are plain identifiers, so they are safe
+    as embedded field names.
+    """
+    return {
+        f"mastery.{key}": {"$round": [{"$add": [
+            MASTERY_ALPHA * observed,
+            {"$multiply": [1 - MASTERY_ALPHA, {"$ifNull": [f"$mastery.{key}", MASTERY_PRIOR]}]},
+        ]}, 1]}
+        for key, observed in mastery_observations(concept, category, score)
+    }
+
+
+def concept_weight(mastery, concept):
+    """Sampling weight for a question on `concept`: 1 at full mastery, 5 at zero."""
+    level = mastery.get(concept, MASTERY_PRIOR) if mastery else MASTERY_PRIOR
+    return 1.0 + max(0.0, 100.0 - level) / 25.0
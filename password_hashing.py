@@ -0,0 +1,207 @@
+# password_hashing.py
+# Password hashing off the request threads. Hashes are computed and verified on a small,
+# bounded process pool so a login storm cannot hold the GIL or queue unbounded CPU work,
+# stored hashes are upgraded to the configured scheme/cost on the next successful login,
+# and repeated attempts per username and per client IP are throttled.
+
+import os
+import time
+import atexit
+import threading
+import collections
+import multiprocessing
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+class LoginRejected(Exception):
+    """Raised when a login or signup is refused: throttled, or the hashing pool is saturated."""
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored_hash, password):
+    return check_password_hash(stored_hash, password)
+
+
+def hash_prefix(method):
+    """
+    The "scheme:params" prefix werkzeug writes for `method`, with its defaults filled in
+    (e.g. "pbkdf2:sha256" -> "pbkdf2:sha256:1000000"), without hashing anything.
+    """
+    name, *args = method.split(":")
+    if name == "scrypt":
+        n, r, p = args or (2 ** 15, 8, 1)
+        return f"scrypt:{int(n)}:{int(r)}:{int(p)}"
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported password hash method '{method}'.")
+
+
+class PasswordHasher:
+    """
+    Hashes and verifies passwords with werkzeug on `max_workers` worker processes (threads
+    if `use_processes` is off). At most `max_pending` operations may be queued or running;
+    callers beyond that wait up to `timeout` seconds for a slot and then get LoginRejected.
+    If a worker process dies, the pool is replaced and the affected callers get LoginRejected.
+    `method` is any werkzeug method string, e.g. "pbkdf2:sha256:600000" or "scrypt:32768:8:1".
+    """
+
+    def __init__(self, method="pbkdf2:sha256", max_workers=2, max_pending=32, timeout=5.0, use_processes=True):
+        self.method = method
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.use_processes = use_processes
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._prefix = hash_prefix(method)
+        atexit.register(self.close)
+
+    def close(self):
+        if self._pid == os.getpid() and self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def _executor(self):
+        # Pools are per process; a forked worker builds its own on first use.
+        with self._lock:
+            if self._pid != os.getpid() or self._pool is None:
+                if self.use_processes:
+                    # Hash workers are started from a clean forkserver, not forked from a threaded app worker.
+                    context = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else None)
+                    self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+                else:
+                    self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _discard(self, pool):
+        """Drops a pool whose worker died (e.g. OOM-killed) so the next call starts a fresh one."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        print("!!! PASSWORD HASHING: a worker process died; starting a new pool !!!")
+
+    def _submit(self, function, *args):
+        """
+        Submits while holding a slot, which is released only when the job finishes, so jobs
+        abandoned by a timed-out caller still count towards `max_pending`.
+        """
+        pool = self._executor()
+        try:
+            future = pool.submit(function, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard(pool)
+            raise LoginRejected("Login is temporarily unavailable. Please try again in a moment.") from None
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return pool, future
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise LoginRejected("The server is handling many logins right now. Please try again in a moment.")
+        pool, future = self._submit(function, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            raise LoginRejected("Login timed out. Please try again in a moment.") from None
+        except BrokenProcessPool:
+            self._discard(pool)
+            raise LoginRejected("Login is temporarily unavailable. Please try again in a moment.") from None
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def hash_many(self, passwords):
+        """Hashes several passwords in parallel; returns them in order."""
+        pool = self._executor()
+        return [future.result() for future in [pool.submit(_hash, password, self.method) for password in passwords]]
+
+    def hash_in_background(self, password, on_hashed):
+        """Hashes without waiting and passes the result to `on_hashed`; skipped if the pool is saturated."""
+        if not self._slots.acquire(blocking=False):
+            return False
+        try:
+            pool, future = self._submit(_hash, password, self.method)
+        except LoginRejected:
+            return False
+
+        def done(future):
+            if future.exception() is None:
+                on_hashed(future.result())
+            elif isinstance(future.exception(), BrokenProcessPool):
+                self._discard(pool)
+
+        future.add_done_callback(done)
+        return True
+
+    def verify(self, stored_hash, password):
+        if not stored_hash or password is None:
+            return False
+        return self._run(_verify, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """True if `stored_hash` was made with a different scheme or cost than `method`."""
+        return stored_hash.split("$", 1)[0] != self._prefix
+
+
+class LoginThrottle:
+    """
+    Sliding-window limits on login attempts: at most `max_per_ip` attempts per client IP and
+    `max_failures_per_user` failed attempts per username within `window` seconds. A
+    successful login clears the username's failures. Counts are per process.
+    """
+
+    def __init__(self, max_per_ip=30, max_failures_per_user=5, window=300, max_keys=50000):
+        self.max_per_ip = max_per_ip
+        self.max_failures_per_user = max_failures_per_user
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._attempts = collections.defaultdict(collections.deque)
+        self._failures = collections.defaultdict(collections.deque)
+
+    def _recent(self, events, key, now):
+        stamps = events.get(key)
+        if stamps is None:
+            return 0
+        while stamps and stamps[0] <= now - self.window:
+            stamps.popleft()
+        if not stamps:
+            del events[key]
+            return 0
+        return len(stamps)
+
+    def check(self, username, ip):
+        """Records an attempt from `ip`, or raises LoginRejected if either limit is reached."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._attempts) + len(self._failures) > self.max_keys:
+                # Drop every key whose window has passed, so a spray of usernames/IPs stays bounded.
+                for events in (self._attempts, self._failures):
+                    for key in list(events):
+                        self._recent(events, key, now)
+            if self._recent(self._failures, username, now) >= self.max_failures_per_user:
+                raise LoginRejected("Too many failed attempts for this account. Please wait a few minutes and try again.")
+            if self._recent(self._attempts, ip, now) >= self.max_per_ip:
+                raise LoginRejected("Too many login attempts from your network. Please wait a few minutes and try again.")
+            self._attempts[ip].append(now)
+
+    def record_failure(self, username):
+        with self._lock:
+            self._failures[username].append(time.monotonic())
+
+    def record_success(self, username):
+        with self._lock:
+            self._failures.pop(username, None)
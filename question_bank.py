@@ -0,0 +1,130 @@
+# question_bank.py
+# Compiles the question lists from interview_data.py into an immutable index at import.
+# Interviews are assembled by sampling question IDs, so nothing is filtered, copied or
+# shuffled per request and the shared data can never be mutated by a route.
+
+import heapq
+import random
+import hashlib
+from types import MappingProxyType
+
+from interview_data import INTERVIEW_QUESTIONS_BY_ROLE, PHASE_INTRODUCTION_Q, PHASE_SOFT_SKILL_Q
+from mastery import concept_weight
+
+# Interview layout: intro questions, then 2 easy/medium + 3 medium/hard technical, then soft skills.
+TECH_TIERS = {
+    "easy_medium": ("easy", "medium"),
+    "medium_hard": ("medium", "hard"),
+    "any": ("easy", "medium", "hard"),
+}
+INTERVIEW_PLAN = (("easy_medium", 2), ("medium_hard", 3))
+SOFT_SKILL_COUNT = 3
+
+
+def question_id(question):
+    """Stable ID derived from the question text, so it survives reordering and restarts."""
+    return hashlib.sha1(question['text'].encode("utf-8")).hexdigest()[:12]
+
+
+def _sample_excluding(tier, count, exclude, rng):
+    """Samples `count` IDs from `tier` that are not in `exclude`, touching O(count) items."""
+    picked = [qid for qid in rng.sample(tier, min(len(tier), count + len(exclude))) if qid not in exclude]
+    return picked[:count]
+
+
+def _weighted_sample_excluding(groups, count, exclude, weight, rng):
+    """
+    Samples up to `count` IDs from `groups` ({concept: IDs}) that are not in `exclude`.
+    Concepts are drawn without replacement with probability proportional to
+    `weight(concept)` (Efraimidis-Spirakis keys), then one question is picked within each
+    drawn concept. Cost grows with the number of concepts, not the number of questions.
+    """
+    keyed = ((rng.random() ** (1.0 / weight(concept)), concept) for concept in groups)
+    # An excluded question can use up at most one drawn concept, so a few spares suffice.
+    picked = []
+    for _, concept in heapq.nlargest(count + len(exclude), keyed):
+        picked += _sample_excluding(groups[concept], 1, exclude, rng)
+        if len(picked) == count:
+            break
+    return picked
+
+
+def _group_by_concept(ids, by_id):
+    groups = {}
+    for qid in ids:
+        groups.setdefault(by_id[qid]['concept'], []).append(qid)
+    return MappingProxyType({concept: tuple(qids) for concept, qids in groups.items()})
+
+
+class QuestionBank:
+    """
+    Read-only index of every interview question by ID, role and difficulty tier, with each
+    tier (and the soft-skill list) also grouped by concept for weakness-weighted sampling.
+    """
+
+    def __init__(self, intro, soft_skills, questions_by_role):
+        by_id = {}
+
+        def register(questions):
+            for question in questions:
+                qid = question_id(question)
+                by_id[qid] = MappingProxyType(dict(question, id=qid))
+            return tuple(question_id(question) for question in questions)
+
+        self.intro_ids = register(intro)
+        self.soft_skill_ids = register(soft_skills)
+        tiers = {}
+        for role, questions in questions_by_role.items():
+            register(questions)
+            tiers[role] = MappingProxyType({
+                name: tuple(question_id(q) for q in questions if q['difficulty'] in levels)
+                for name, levels in TECH_TIERS.items()
+            })
+        self.by_id = MappingProxyType(by_id)
+        self.tiers = MappingProxyType(tiers)
+        self.tier_concepts = MappingProxyType({
+            role: MappingProxyType({name: _group_by_concept(ids, by_id) for name, ids in role_tiers.items()})
+            for role, role_tiers in tiers.items()
+        })
+        self.soft_skill_concepts = _group_by_concept(self.soft_skill_ids, by_id)
+
+    def __contains__(self, question_id):
+        return question_id in self.by_id
+
+    def get(self, question_id):
+        return self.by_id[question_id]
+
+    def has_role(self, role):
+        return role in self.tiers
+
+    def build_interview(self, role, rng=random, mastery=None):
+        """
+        Returns the question IDs for one interview. Cost depends only on the interview length
+        (and, with a `mastery` map, on the number of concepts per tier). With a mastery map
+        (see mastery.py) technical and soft-skill questions are drawn weighted towards the
+        student's weakest concepts.
+        """
+        def sample(ids, groups, count, exclude):
+            if not mastery:
+                return _sample_excluding(ids, count, exclude, rng)
+            chosen = _weighted_sample_excluding(groups, count, exclude, lambda concept: concept_weight(mastery, concept), rng)
+            if len(chosen) < count:
+                # Fewer concepts than questions needed; fill from the tier uniformly.
+                chosen += _sample_excluding(ids, count - len(chosen), set(exclude).union(chosen), rng)
+            return chosen
+
+        tiers, concepts = self.tiers[role], self.tier_concepts[role]
+        picked = list(self.intro_ids)
+        technical = set()
+        for tier_name, count in INTERVIEW_PLAN:
+            chosen = sample(tiers[tier_name], concepts[tier_name], count, technical)
+            if len(chosen) < count:
+                # The tiers overlap on medium questions; top up from the rest of the role's pool.
+                chosen += sample(tiers["any"], concepts["any"], count - len(chosen), technical.union(chosen))
+            technical.update(chosen)
+            picked.extend(chosen)
+        picked.extend(sample(self.soft_skill_ids, self.soft_skill_concepts, SOFT_SKILL_COUNT, ()))
+        return picked
+
+
+QUESTION_BANK = QuestionBank(PHASE_INTRODUCTION_Q, PHASE_SOFT_SKILL_Q, INTERVIEW_QUESTIONS_BY_ROLE)
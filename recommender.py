@@ -0,0 +1,95 @@
+# recommender.py
+# Ranks remedial resources for a student's accumulated weaknesses. At import, every concept
+# (from the question bank and the REMEDIAL_RESOURCES keys) and every resource is turned into
+# a TF-IDF vector over the words of its questions, title and key, and their cosine
+# similarities are stored as one concept x resource matrix. A recommendation is then a
+# single vector-matrix product of the student's weakness vector with that matrix.
+
+import numpy as np
+
+from interview_data import INTERVIEW_QUESTIONS_BY_ROLE, PHASE_INTRODUCTION_Q, PHASE_SOFT_SKILL_Q, REMEDIAL_RESOURCES
+from answer_analysis import STOPWORDS, WORD_RE
+
+MASTERED_LEVEL = 70.0  # Concepts at or above this mastery contribute no weakness.
+HIGH_PRIORITY_LEVEL = 40.0
+
+
+def _terms(text):
+    return [word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS]
+
+
+def _tfidf(documents, vocabulary):
+    """L2-normalised TF-IDF rows, one per document (a list of terms)."""
+    counts = np.zeros((len(documents), len(vocabulary)))
+    for row, terms in enumerate(documents):
+        for term in terms:
+            counts[row, vocabulary[term]] += 1
+    idf = np.log((1 + len(documents)) / (1 + np.count_nonzero(counts, axis=0))) + 1
+    weights = counts * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return weights / np.where(norms == 0, 1, norms)
+
+
+class ResourceRecommender:
+    """
+    Precomputed concept-to-resource similarity index. `recommend(mastery, k)` returns the k
+    resources most relevant to the student's weak concepts, strongest match first.
+    """
+
+    def __init__(self, questions, resources):
+        concept_terms = {}
+        for question in questions:
+            concept_terms.setdefault(question['concept'], _terms(question['concept'])).extend(_terms(question['text']))
+        for key, resource in resources.items():
+            # Categories such as filler_words have a resource but no question.
+            concept_terms.setdefault(key, _terms(key) + _terms(resource['title']))
+
+        self.concepts = tuple(concept_terms)
+        self.concept_index = {concept: row for row, concept in enumerate(self.concepts)}
+        self.resource_keys = tuple(resources)
+        self.resources = tuple(dict(resources[key], key=key) for key in self.resource_keys)
+
+        resource_terms = [_terms(key) + _terms(resources[key]['title']) for key in self.resource_keys]
+        documents = list(concept_terms.values()) + resource_terms
+        vocabulary = {term: column for column, term in enumerate(sorted({term for terms in documents for term in terms}))}
+        vectors = _tfidf(documents, vocabulary)
+        similarity = vectors[:len(self.concepts)] @ vectors[len(self.concepts):].T
+        # A concept's own resource is always its best match.
+        for column, key in enumerate(self.resource_keys):
+            similarity[self.concept_index[key], column] = 1.0
+        self.similarity = similarity
+        self.similarity.setflags(write=False)
+
+    def weakness_vector(self, mastery):
+        weakness = np.zeros(len(self.concepts))
+        for concept, level in (mastery or {}).items():
+            row = self.concept_index.get(concept)
+            if row is not None and level < MASTERED_LEVEL:
+                weakness[row] = MASTERED_LEVEL - level
+        return weakness
+
+    def recommend(self, mastery, k=3):
+        """Top-k resources as dicts: title, link, key, the concept driving it and a priority."""
+        weakness = self.weakness_vector(mastery)
+        if not weakness.any():
+            return []
+        scores = weakness @ self.similarity
+        k = min(k, np.count_nonzero(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        recommendations = []
+        for column in top[np.argsort(-scores[top])]:
+            concept = self.concepts[(weakness * self.similarity[:, column]).argmax()]
+            recommendations.append(dict(
+                self.resources[column],
+                concept=concept,
+                priority="high" if mastery[concept] < HIGH_PRIORITY_LEVEL else "medium",
+            ))
+        return recommendations
+
+
+RESOURCE_RECOMMENDER = ResourceRecommender(
+    PHASE_INTRODUCTION_Q + PHASE_SOFT_SKILL_Q + [q for questions in INTERVIEW_QUESTIONS_BY_ROLE.values() for q in questions],
+    REMEDIAL_RESOURCES,
+)
@@ -0,0 +1,431 @@
+# sandbox.py
+# Local execution backend for the /compiler route. Code runs in pre-warmed launcher
+# processes that already carry their resource limits, so a run only pays for the program
+# itself. Every launcher and every compiler run is confined by bubblewrap (bwrap): new
+# user, mount, pid, ipc and network namespaces, an unprivileged uid, a read-only view of
+# the toolchain, and a size-capped private /tmp and working directory. Nothing else of the
+# host filesystem (the app, its .env, other runs) is visible. Each run also gets its own
+# cgroup bounding its task count and total memory. Without bwrap, or without a way to
+# bound the number of processes a submission starts, the backend refuses to start.
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import signal
+import hashlib
+import resource
+import tempfile
+import threading
+import uuid
+import subprocess
+import collections
+
+# --- Per-language toolchains and limits ---
+COMPILE_MEMORY_MB = int(os.getenv('SANDBOX_COMPILE_MEMORY_MB', 1024))
+
+# `memory_mb` and `compile_memory_mb` become RLIMIT_AS; the JVM reserves far more address
+# space than it uses, so java and javac are bounded with -Xmx (and the run's cgroup) instead.
+SANDBOX_LANGUAGES = {
+    "python": {"compile": None, "memory_mb": 256},
+    "c": {"compile": ["gcc", "-O2", "-o", "{artifact}/prog", "{source}", "-lm"], "filename": "main.c", "run": ["{artifact}/prog"], "memory_mb": 256, "compile_memory_mb": COMPILE_MEMORY_MB},
+    "cpp": {"compile": ["g++", "-O2", "-o", "{artifact}/prog", "{source}"], "filename": "main.cpp", "run": ["{artifact}/prog"], "memory_mb": 256, "compile_memory_mb": COMPILE_MEMORY_MB},
+    "java": {"compile": ["javac", "-J-Xmx512m", "-J-XX:MaxMetaspaceSize=128m", "-d", "{artifact}", "{source}"], "filename": "Main.java", "run": ["java", "-Xmx256m", "-cp", "{artifact}", "Main"], "memory_mb": None, "compile_memory_mb": None},
+}
+
+RUN_CPU_SECONDS = int(os.getenv('SANDBOX_CPU_SECONDS', 5))
+RUN_WALL_SECONDS = int(os.getenv('SANDBOX_WALL_SECONDS', 10))
+COMPILE_WALL_SECONDS = int(os.getenv('SANDBOX_COMPILE_SECONDS', 30))
+MAX_OUTPUT_BYTES = 64 * 1024
+MAX_CACHED_ARTIFACTS = int(os.getenv('SANDBOX_MAX_ARTIFACTS', 500))
+# Size of each in-memory scratch mount (/tmp, and /work for runs).
+TMPFS_MB = int(os.getenv('SANDBOX_TMPFS_MB', 16))
+
+# Parent cgroup (v2) for per-run cgroups capping tasks (pids.max) and memory (memory.max,
+# tmpfs pages included). It must be delegated to the app user with "+pids +memory" in its
+# cgroup.subtree_control, and the app must run in a leaf below it (e.g. <cgroup>/app), as
+# with a systemd unit using Delegate=yes.
+SANDBOX_CGROUP = os.getenv('SANDBOX_CGROUP')
+RUN_MAX_TASKS = int(os.getenv('SANDBOX_MAX_TASKS', 32))
+RUN_MEMORY_MB = int(os.getenv('SANDBOX_RUN_MEMORY_MB', 512))
+# Without SANDBOX_CGROUP the task count falls back to RLIMIT_NPROC. The kernel counts that per
+# uid, so it only works when the app runs as root and drops to SANDBOX_UID, and it then caps
+# all sandboxed processes on the host together.
+SANDBOX_MAX_PROCS = int(os.getenv('SANDBOX_MAX_PROCS', 256))
+
+BWRAP = os.getenv('SANDBOX_BWRAP', 'bwrap')
+# Uid/gid submissions run as: inside the namespace, and on the host too when the app runs as root.
+SANDBOX_UID = int(os.getenv('SANDBOX_UID', 65534))
+# Interpreter for the launcher; its installation prefix is mounted read-only in the sandbox, so it
+# must be readable by SANDBOX_UID (a system python, not one under /root).
+SANDBOX_PYTHON = os.path.realpath(os.getenv('SANDBOX_PYTHON', sys.executable))
+# Read-only toolchain mounts (plus the interpreter prefix and /etc/java-* for the JVM).
+TOOLCHAIN_PATHS = ("/usr", "/bin", "/sbin", "/lib", "/lib32", "/lib64", "/etc/alternatives", "/etc/ld.so.cache", "/etc/ld.so.conf", "/etc/ld.so.conf.d")
+SANDBOX_PATH = "/usr/local/bin:/usr/bin:/bin"
+
+# The launcher is what sits warm in the pool. It reads a one-line JSON header from stdin,
+# then either execs the Python source in-process or execs a compiled artifact. The header
+# and source are read with os.read so no program stdin is swallowed by buffering.
+LAUNCHER = r"""
+import os, sys, json
+def read_exact(n):
+    chunks = []
+    while n:
+        chunk = os.read(0, n)
+        if not chunk: break
+        chunks.append(chunk); n -= len(chunk)
+    return b"".join(chunks)
+header = b""
+while not header.endswith(b"\n"):
+    byte = os.read(0, 1)
+    if not byte: sys.exit(0)
+    header += byte
+job = json.loads(header)
+if job["mode"] == "exec":
+    os.execvp(job["argv"][0], job["argv"])
+source = read_exact(job["source_len"]).decode("utf-8")
+sys.argv = ["main.py"]
+exec(compile(source, "main.py", "exec"), {"__name__": "__main__", "__builtins__": __builtins__})
+"""
+
+
+class SandboxUnavailable(RuntimeError):
+    """Raised at startup when submissions cannot be isolated on this host."""
+
+
+def _host_uid_drop():
+    # When the app runs as root, bwrap itself runs as SANDBOX_UID, so even an escape lands unprivileged.
+    return os.geteuid() == 0
+
+
+def _sandbox_argv(read_only=(), writable=(), chdir="/work", scratch=("/tmp", "/work")):
+    """
+    The bwrap prefix for one sandboxed command. `read_only` and `writable` are
+    (host path, sandbox path) pairs mounted in addition to the toolchain; each `scratch`
+    path is a private tmpfs of TMPFS_MB.
+    """
+    argv = [
+        BWRAP, "--unshare-all", "--unshare-user", "--die-with-parent", "--new-session", "--cap-drop", "ALL",
+        "--uid", str(SANDBOX_UID), "--gid", str(SANDBOX_UID),
+        "--proc", "/proc", "--dev", "/dev",
+    ]
+    for path in scratch:
+        argv += ["--size", str(TMPFS_MB * 1024 * 1024), "--tmpfs", path]
+    interpreter_prefix = os.path.dirname(os.path.dirname(SANDBOX_PYTHON))
+    for path in TOOLCHAIN_PATHS + (interpreter_prefix,) + tuple(glob.glob("/etc/java*")):
+        if os.path.islink(path):
+            argv += ["--symlink", os.readlink(path), path]
+        elif os.path.exists(path):
+            argv += ["--ro-bind", path, path]
+    for source, target in read_only:
+        argv += ["--ro-bind", source, target]
+    for source, target in writable:
+        argv += ["--bind", source, target]
+    return argv + ["--chdir", chdir, "--setenv", "HOME", chdir]
+
+
+def _sandbox_preexec(memory_mb, cpu_seconds, file_mb=1, cgroup=None):
+    """
+    Builds the preexec_fn that, in the child before bwrap starts, joins the run's cgroup,
+    applies rlimits and drops root.
+    """
+    def apply():
+        if cgroup is not None:
+            cgroup.enter()
+        elif _host_uid_drop():
+            resource.setrlimit(resource.RLIMIT_NPROC, (SANDBOX_MAX_PROCS, SANDBOX_MAX_PROCS))
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_mb * 1024 * 1024, file_mb * 1024 * 1024))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        if memory_mb:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024, memory_mb * 1024 * 1024))
+        if _host_uid_drop():
+            os.setgroups([])
+            os.setgid(SANDBOX_UID)
+            os.setuid(SANDBOX_UID)
+    return apply
+
+
+class RunCgroup:
+    """A throwaway cgroup under SANDBOX_CGROUP holding every process of one sandboxed run."""
+
+    def __init__(self, memory_mb):
+        self.path = os.path.join(SANDBOX_CGROUP, f"run-{uuid.uuid4().hex}")
+        os.mkdir(self.path)
+        try:
+            self._write("pids.max", RUN_MAX_TASKS)
+            self._write("memory.max", memory_mb * 1024 * 1024)
+            if os.path.exists(os.path.join(self.path, "memory.swap.max")):
+                self._write("memory.swap.max", 0)
+        except OSError:
+            self.remove()
+            raise
+
+    def _write(self, name, value):
+        with open(os.path.join(self.path, name), "w") as f:
+            f.write(str(value))
+
+    def enter(self):
+        """Moves the calling process in; runs in the child between fork and exec."""
+        fd = os.open(os.path.join(self.path, "cgroup.procs"), os.O_WRONLY)
+        try:
+            os.write(fd, str(os.getpid()).encode())
+        finally:
+            os.close(fd)
+
+    def oom_killed(self):
+        try:
+            with open(os.path.join(self.path, "memory.events")) as f:
+                for line in f:
+                    key, _, count = line.partition(" ")
+                    if key == "oom_kill":
+                        return int(count) > 0
+        except OSError:
+            pass
+        return False
+
+    def remove(self):
+        """Kills anything left in the cgroup and deletes it."""
+        if os.path.exists(os.path.join(self.path, "cgroup.kill")):
+            try:
+                self._write("cgroup.kill", 1)
+            except OSError:
+                pass
+        for _ in range(100):
+            try:
+                os.rmdir(self.path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                time.sleep(0.01)  # Busy until the killed tasks have exited.
+        print(f"!!! SANDBOX: could not remove cgroup {self.path} !!!")
+
+
+def _run_cgroup(memory_mb):
+    return RunCgroup(memory_mb) if SANDBOX_CGROUP else None
+
+
+def _give_to_sandbox(path):
+    if _host_uid_drop():
+        os.chown(path, SANDBOX_UID, SANDBOX_UID)
+
+
+def _take_back(path):
+    """Returns a finished build to the app's uid and makes it world-readable but not writable."""
+    for root, dirs, files in os.walk(path):
+        for name in [root] + [os.path.join(root, entry) for entry in dirs + files]:
+            if _host_uid_drop():
+                os.lchown(name, os.getuid(), os.getgid())
+            if not os.path.islink(name):
+                os.chmod(name, (os.stat(name).st_mode | 0o444) & ~0o022)
+    os.chmod(path, 0o755)
+
+
+class LocalExecutor:
+    """
+    Executes code on this machine. Each language keeps `warm_workers` launcher processes
+    spawned ahead of time with their limits applied; a worker is used once and replaced in
+    the background. C/C++/Java builds are cached on disk by source hash, so identical
+    submissions skip the compiler. Results carry wall time, CPU time and peak memory.
+    """
+
+    def __init__(self, warm_workers=None, artifact_dir=None):
+        self.warm_workers = warm_workers or int(os.getenv('SANDBOX_WARM_WORKERS', 2))
+        self.artifact_dir = artifact_dir or os.getenv('SANDBOX_ARTIFACT_DIR') or os.path.join(tempfile.gettempdir(), "campus360-artifacts")
+        os.makedirs(self.artifact_dir, mode=0o755, exist_ok=True)
+        if os.stat(self.artifact_dir).st_uid != os.getuid():
+            # Someone else could plant binaries in a cache directory they own.
+            raise SandboxUnavailable(f"Artifact cache {self.artifact_dir} is not owned by the app user.")
+        os.chmod(self.artifact_dir, 0o755)
+        self._check_isolation()
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._pid = None
+
+    def _check_isolation(self):
+        """Runs a trivial sandboxed command; raises SandboxUnavailable if it cannot be isolated."""
+        if not shutil.which(BWRAP):
+            raise SandboxUnavailable(f"bubblewrap ('{BWRAP}') is not installed; the local executor cannot isolate submissions.")
+        if not SANDBOX_CGROUP and not _host_uid_drop():
+            # RLIMIT_NPROC would count the app's own processes and threads; nothing else stops a fork bomb.
+            raise SandboxUnavailable("Set SANDBOX_CGROUP (or run the app as root) so the local executor can bound the processes a submission starts.")
+        try:
+            cgroup = _run_cgroup(RUN_MEMORY_MB)
+        except OSError as e:
+            raise SandboxUnavailable(f"Cannot create a run cgroup under {SANDBOX_CGROUP}: {e}") from None
+        try:
+            probe = subprocess.run(
+                _sandbox_argv([(self.artifact_dir, "/artifacts")]) + [SANDBOX_PYTHON, "-I", "-c", "open('probe', 'w')"],
+                capture_output=True, env={"PATH": SANDBOX_PATH}, timeout=COMPILE_WALL_SECONDS,
+                preexec_fn=_sandbox_preexec(None, RUN_CPU_SECONDS, cgroup=cgroup),
+            )
+        except (subprocess.TimeoutExpired, OSError, subprocess.SubprocessError) as e:
+            raise SandboxUnavailable(f"Sandbox probe failed: {e}") from None
+        finally:
+            if cgroup is not None:
+                cgroup.remove()
+        if probe.returncode != 0:
+            raise SandboxUnavailable(f"Sandbox probe failed: {probe.stderr.decode('utf-8', 'replace').strip()}")
+
+    # --- Warm pool ---
+
+    def _spawn(self, language):
+        cgroup = _run_cgroup(RUN_MEMORY_MB)
+        try:
+            process = subprocess.Popen(
+                # The artifact cache is mounted read-only; the only writable paths are the run's own tmpfs mounts.
+                _sandbox_argv([(self.artifact_dir, "/artifacts")]) + [SANDBOX_PYTHON, "-I", "-c", LAUNCHER],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                env={"PATH": SANDBOX_PATH},
+                preexec_fn=_sandbox_preexec(SANDBOX_LANGUAGES[language]["memory_mb"], RUN_CPU_SECONDS, cgroup=cgroup),
+                start_new_session=True,
+            )
+        except BaseException:
+            if cgroup is not None:
+                cgroup.remove()
+            raise
+        return process, cgroup
+
+    def _take_worker(self, language):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Warm workers belong to the process that spawned them; start fresh after a fork.
+                self._pools = {lang: collections.deque() for lang in SANDBOX_LANGUAGES}
+                self._pid = os.getpid()
+            pool = self._pools[language]
+            worker = pool.popleft() if pool else None
+        threading.Thread(target=self._refill, args=(language,), daemon=True).start()
+        return worker or self._spawn(language)
+
+    def _refill(self, language):
+        while True:
+            with self._lock:
+                if len(self._pools[language]) >= self.warm_workers:
+                    return
+            worker = self._spawn(language)
+            with self._lock:
+                self._pools[language].append(worker)
+
+    # --- Compilation cache ---
+
+    def _artifact_for(self, language, code):
+        """Returns (artifact_dir, None) for a cached or fresh build, or (None, compiler_output)."""
+        spec = SANDBOX_LANGUAGES[language]
+        digest = hashlib.sha256(f"{language}\0{code}".encode("utf-8")).hexdigest()
+        artifact = os.path.join(self.artifact_dir, digest)
+        if os.path.isdir(artifact):
+            os.utime(artifact)
+            return artifact, None
+
+        build_dir = tempfile.mkdtemp(prefix="build-", dir=self.artifact_dir)
+        with open(os.path.join(build_dir, spec["filename"]), "w", encoding="utf-8") as f:
+            f.write(code)
+        _give_to_sandbox(build_dir)
+        # The compiler is sandboxed too (an #include can read any file it can see) and only sees /build,
+        # where RLIMIT_FSIZE bounds what it writes.
+        command = [part.format(artifact="/build", source=f"/build/{spec['filename']}") for part in spec["compile"]]
+        cgroup = None
+        try:
+            cgroup = _run_cgroup(COMPILE_MEMORY_MB)
+            build = subprocess.run(
+                _sandbox_argv(writable=[(build_dir, "/build")], chdir="/build", scratch=("/tmp",)) + command,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env={"PATH": SANDBOX_PATH}, timeout=COMPILE_WALL_SECONDS,
+                preexec_fn=_sandbox_preexec(spec["compile_memory_mb"], COMPILE_WALL_SECONDS, file_mb=64, cgroup=cgroup),
+            )
+        except (subprocess.TimeoutExpired, OSError, subprocess.SubprocessError) as e:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return None, f"Compilation failed: {e}"
+        finally:
+            if cgroup is not None:
+                cgroup.remove()
+        if build.returncode != 0:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return None, build.stdout.decode("utf-8", "replace")[:MAX_OUTPUT_BYTES]
+
+        _take_back(build_dir)
+        try:
+            os.rename(build_dir, artifact)
+        except OSError:
+            shutil.rmtree(build_dir, ignore_errors=True)  # Another worker built the same source first.
+        self._evict_artifacts()
+        return artifact, None
+
+    def _evict_artifacts(self):
+        entries = [os.path.join(self.artifact_dir, name) for name in os.listdir(self.artifact_dir) if not name.startswith("build-")]
+        if len(entries) <= MAX_CACHED_ARTIFACTS:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - MAX_CACHED_ARTIFACTS]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    # --- Execution ---
+
+    def execute(self, language, version, code, stdin=""):
+        spec = SANDBOX_LANGUAGES.get(language)
+        if spec is None:
+            return {"output": f"Language '{language}' is not supported by the local runner.", "status": None}
+
+        if spec["compile"] is None:
+            payload = code.encode("utf-8")
+            header = {"mode": "python", "source_len": len(payload)}
+        else:
+            if not shutil.which(spec["compile"][0]):
+                return {"output": f"The {language} toolchain is not installed on this runner.", "status": None}
+            artifact, compile_output = self._artifact_for(language, code)
+            if artifact is None:
+                return {"output": compile_output or "Compile Error", "status": "Compile Error"}
+            payload = b""
+            # Workers see the cache at /artifacts (read-only).
+            sandbox_artifact = "/artifacts/" + os.path.basename(artifact)
+            header = {"mode": "exec", "argv": [part.format(artifact=sandbox_artifact) for part in spec["run"]]}
+
+        process, cgroup = self._take_worker(language)
+        started = time.monotonic()
+        try:
+            return self._run(process, cgroup, json.dumps(header).encode("utf-8") + b"\n" + payload + stdin.encode("utf-8"), started)
+        finally:
+            if cgroup is not None:
+                cgroup.remove()
+
+    def _run(self, process, cgroup, data, started):
+        captured = []
+
+        def pump():
+            try:
+                process.stdin.write(data)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            captured.append(process.stdout.read(MAX_OUTPUT_BYTES + 1))
+
+        reader = threading.Thread(target=pump, daemon=True)
+        reader.start()
+        reader.join(RUN_WALL_SECONDS)
+        timed_out = reader.is_alive()
+        if timed_out or (captured and len(captured[0]) > MAX_OUTPUT_BYTES):
+            os.killpg(process.pid, signal.SIGKILL)
+            reader.join()
+
+        # Reap the child ourselves so its rusage (CPU time, peak RSS) is available.
+        _, wait_status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(wait_status)
+        process.stdout.close()
+
+        output = (captured[0] if captured else b"")[:MAX_OUTPUT_BYTES].decode("utf-8", "replace")
+        metrics = {
+            "wall_time_ms": round((time.monotonic() - started) * 1000, 1),
+            "cpu_time_ms": round((usage.ru_utime + usage.ru_stime) * 1000, 1),
+            "peak_memory_kb": usage.ru_maxrss,
+        }
+
+        if timed_out:
+            return {"output": output + f"\nTime limit exceeded ({RUN_WALL_SECONDS}s).", "status": "Runtime Error", "metrics": metrics}
+        if cgroup is not None and cgroup.oom_killed():
+            return {"output": output + f"\nMemory limit exceeded ({RUN_MEMORY_MB} MB).", "status": "Runtime Error", "metrics": metrics}
+        if process.returncode == -signal.SIGXCPU or process.returncode == -signal.SIGKILL:
+            return {"output": output + f"\nCPU limit exceeded ({RUN_CPU_SECONDS}s) or process killed.", "status": "Runtime Error", "metrics": metrics}
+        return {"output": output, "status": "Success" if process.returncode == 0 else "Runtime Error", "metrics": metrics}
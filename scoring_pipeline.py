@@ -0,0 +1,197 @@
+# scoring_pipeline.py
+# Deferred interview scoring: answers are queued as jobs and scored by background workers,
+# so the interview flow only pays for rendering the next question. When the last answer of
+# an interview has been scored, a single report document is assembled for it.
+
+import os
+import queue
+import atexit
+import datetime
+import threading
+
+from pymongo import ReturnDocument
+
+
+class ScoringRejected(Exception):
+    """Raised when an answer cannot be queued because the scoring queue is full."""
+
+
+class LocalJobQueue:
+    """
+    In-process job queue. Jobs are lost if the process dies before they are scored.
+    `put` waits at most `put_timeout` seconds for room and then raises queue.Full. Delayed
+    jobs (retries) count as unfinished until they are back on the queue, so `join` also
+    waits for them.
+    """
+
+    def __init__(self, max_pending=10000, put_timeout=2.0):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.put_timeout = put_timeout
+        self._delayed = 0
+        self._idle = threading.Condition()
+
+    def put(self, job, delay=0):
+        if not delay:
+            self._queue.put(job, timeout=self.put_timeout)
+            return
+        with self._idle:
+            self._delayed += 1
+
+        def release():
+            try:
+                self._queue.put(job)  # A background timer thread, so it may wait for room.
+            finally:
+                with self._idle:
+                    self._delayed -= 1
+                    self._idle.notify_all()
+
+        timer = threading.Timer(delay, release)
+        timer.daemon = True
+        timer.start()
+
+    def get(self, timeout=None):
+        """Returns the next job, or None if none arrived within `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def task_done(self):
+        self._queue.task_done()
+
+    def join(self):
+        # A retry is scheduled before its failed attempt is marked done, so once the queue is
+        # joined every pending retry is already counted in _delayed.
+        while True:
+            self._queue.join()
+            with self._idle:
+                if not self._delayed:
+                    return
+                self._idle.wait_for(lambda: not self._delayed)
+
+
+class ScoringPipeline:
+    """
+    Scores queued answers with `engine` (an AnalysisEngine) on `workers` threads, taking up
+    to `batch_size` waiting answers at a time. Failed jobs are retried with exponential
+    backoff up to `max_retries` times. Each scored answer is handed to `on_scored(job,
+    analysis)`, and its summary is folded into the interview's document in `reports`.
+    The report is finalized once all `total_questions` answers have been scored.
+    """
+
+    def __init__(self, engine, reports, on_scored, job_queue=None, workers=2, batch_size=16, max_retries=3):
+        self.engine = engine
+        self.reports = reports
+        self.on_scored = on_scored
+        self.job_queue = job_queue or LocalJobQueue()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._pid = None
+        atexit.register(self.drain)
+
+    def _ensure_workers(self):
+        # Worker threads do not survive a fork; each process starts its own.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            for _ in range(self.workers):
+                threading.Thread(target=self._worker, daemon=True).start()
+            self._pid = os.getpid()
+
+    # --- Producer side (request path) ---
+
+    def open_interview(self, interview_id, student_id, role, total_questions):
+        """Creates the in-progress report that answers will be folded into."""
+        self.reports.insert_one({
+            "_id": interview_id, "student_id": student_id, "role": role, "status": "in_progress",
+            "total_questions": total_questions, "scored": 0, "answers": [],
+            "started_at": datetime.datetime.utcnow(),
+        })
+
+    def enqueue(self, interview_id, student_id, index, question, answer, role=None, username=None):
+        """Queues one answer for scoring; raises ScoringRejected if the queue stays full."""
+        self._ensure_workers()
+        try:
+            self.job_queue.put({
+                "interview_id": interview_id, "student_id": student_id, "username": username, "index": index, "role": role,
+                "question": dict(question), "answer": answer, "answered_at": datetime.datetime.utcnow(), "attempts": 0,
+            })
+        except queue.Full:
+            raise ScoringRejected("Answers are being scored slowly right now. Please submit your answer again in a moment.") from None
+
+    def drain(self):
+        """Waits for every queued answer, including scheduled retries, to be scored (used at shutdown)."""
+        if self._pid == os.getpid():
+            self.job_queue.join()
+
+    # --- Consumer side (worker threads) ---
+
+    def _worker(self):
+        while True:
+            batch = [self.job_queue.get()]
+            while len(batch) < self.batch_size:
+                job = self.job_queue.get(timeout=0)
+                if job is None:
+                    break
+                batch.append(job)
+
+            # Retried jobs that were already scored only need their report update redone.
+            pending = [job for job in batch if 'analysis' not in job]
+            try:
+                analyses = self.engine.analyze_batch([(job['question'], job['answer']) for job in pending])
+            except Exception as e:
+                print(f"!!! SCORING PIPELINE: batch of {len(pending)} answers failed: {e} !!!")
+                analyses = [None] * len(pending)
+            fresh = {id(job): analysis for job, analysis in zip(pending, analyses)}
+
+            for job in batch:
+                try:
+                    if 'analysis' not in job:
+                        analysis = fresh[id(job)]
+                        if analysis is None:
+                            raise RuntimeError("analyzer and fallback both failed")
+                        self.on_scored(job, analysis)
+                        job['analysis'] = analysis
+                    self._record(job, job['analysis'])
+                except Exception as e:
+                    self._retry(job, e)
+                finally:
+                    self.job_queue.task_done()
+
+    def _retry(self, job, error):
+        job['attempts'] += 1
+        if job['attempts'] > self.max_retries:
+            print(f"!!! SCORING PIPELINE: giving up on answer {job['index']} of interview {job['interview_id']}: {error} !!!")
+            return
+        self.job_queue.put(job, delay=0.5 * 2 ** job['attempts'])
+
+    def _record(self, job, analysis):
+        summary = {
+            "index": job['index'], "question": job['question']['text'], "concept": job['question']['concept'],
+            "score": analysis['score'], "improvement_category": analysis['improvement_category'],
+        }
+        report = self.reports.find_one_and_update(
+            {"_id": job['interview_id'], "answers.index": {"$ne": job['index']}},
+            {"$push": {"answers": summary}, "$inc": {"scored": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if report and report['status'] == "in_progress" and report['scored'] >= report['total_questions']:
+            self._finalize(report)
+
+    def _finalize(self, report):
+        answers = sorted(report['answers'], key=lambda a: a['index'])
+        weakest = sorted(answers, key=lambda a: a['score'])[:3]
+        self.reports.update_one(
+            {"_id": report['_id'], "status": "in_progress"},
+            {"$set": {
+                "status": "complete",
+                "answers": answers,
+                "avg_score": round(sum(a['score'] for a in answers) / len(answers), 1),
+                "focus_areas": list(dict.fromkeys(a['improvement_category'] for a in weakest)),
+                "completed_at": datetime.datetime.utcnow(),
+            }},
+        )
@@ -0,0 +1,177 @@
+# write_buffer.py
+# Write-behind buffer: request handlers hand their Mongo writes to a background thread,
+# which coalesces them into bulk_write batches per collection.
+
+import os
+import time
+import queue
+import atexit
+import threading
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBehindBuffer:
+    """
+    Queues inserts/updates and flushes them with one ordered bulk_write per collection,
+    whenever `max_batch` operations are pending or every `flush_interval` seconds.
+    The queue holds at most `max_pending` operations; when it is full a caller waits up to
+    `put_timeout` seconds and then performs its write synchronously (backpressure).
+    Pending writes are flushed at interpreter exit. A write may carry an `on_written`
+    callback, which runs once the batch containing it has been sent to MongoDB.
+
+    After a transient error, part of an ordered bulk may already have been applied, so
+    only idempotent writes are retried: inserts, whose _id is fixed client-side, where a
+    duplicate key on retry means the first attempt landed. Updates ($inc counters, rollup
+    pipelines) are dropped rather than risk double counting; `flask rebuild-student-stats`
+    and `flask compact-activity-buckets` repair the rollups and buckets from the raw data.
+    """
+
+    def __init__(self, max_batch=500, flush_interval=0.5, max_pending=10000, put_timeout=0.5, max_retries=3):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def _ensure_started(self):
+        # The flusher thread does not survive a fork, so each worker process starts its own.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_pending)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def insert(self, collection, document, on_written=None):
+        # pymongo assigns a missing _id on the document before the first send, so a resend is a no-op.
+        self.submit(collection, InsertOne(document), on_written, idempotent=True)
+
+    def update(self, collection, filter, update, upsert=False, on_written=None):
+        self.submit(collection, UpdateOne(filter, update, upsert=upsert), on_written)
+
+    def submit(self, collection, operation, on_written=None, idempotent=False):
+        """
+        Queues one pymongo write model (InsertOne, UpdateOne, ...) for `collection`.
+        Pass `idempotent=True` only if applying it twice has the same effect as once.
+        """
+        if not self._closed:
+            self._ensure_started()
+            try:
+                self._queue.put((collection, operation, on_written, idempotent), timeout=self.put_timeout)
+                return
+            except queue.Full:
+                pass
+        collection.bulk_write([operation])
+        if on_written:
+            on_written()
+
+    def flush(self):
+        """Blocks until every write queued so far has been sent to MongoDB."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        self._closed = True
+        if self._pid != os.getpid():
+            return
+        self._queue.put(None, timeout=30)
+        self._thread.join(timeout=30)
+
+    def _run(self):
+        while True:
+            # Block for the first write, then give the batch `flush_interval` to fill up.
+            item = self._queue.get()
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            if batch:
+                self._write(batch)
+                self._notify(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if item is None:
+                self._queue.task_done()
+                return
+
+    def _write(self, batch):
+        # Group by collection, keeping the submission order within each collection.
+        grouped = {}
+        for collection, operation, _, idempotent in batch:
+            grouped.setdefault(collection.full_name, (collection, []))[1].append((operation, idempotent))
+
+        for collection, operations in grouped.values():
+            try:
+                self._write_collection(collection, operations)
+            except Exception as e:
+                # Never let one bad collection kill the flusher or the other collections' writes.
+                print(f"!!! WRITE BUFFER: dropped {len(operations)} writes to {collection.full_name}: {e} !!!")
+
+    def _write_collection(self, collection, operations):
+        """Sends one collection's (operation, idempotent) pairs as an ordered bulk."""
+        while operations:
+            try:
+                collection.bulk_write([operation for operation, _ in operations], ordered=True)
+                return
+            except BulkWriteError as e:
+                # An ordered batch stops at the first rejected write; skip it and resume.
+                failed = e.details['writeErrors'][0]
+                print(f"!!! WRITE BUFFER: write rejected by {collection.full_name}: {failed.get('errmsg')} !!!")
+                operations = operations[failed['index'] + 1:]
+            except PyMongoError as e:
+                # Some prefix may have been applied; only writes that are safe to repeat are resent.
+                retryable = [operation for operation, idempotent in operations if idempotent]
+                if len(retryable) < len(operations):
+                    print(f"!!! WRITE BUFFER: dropped {len(operations) - len(retryable)} non-idempotent writes to "
+                          f"{collection.full_name} after an error: {e}. Run rebuild-student-stats / compact-activity-buckets to repair. !!!")
+                self._retry_idempotent(collection, retryable, e)
+                return
+
+    def _retry_idempotent(self, collection, operations, error):
+        for attempt in range(1, self.max_retries):
+            if not operations:
+                return
+            time.sleep(0.2 * attempt)
+            try:
+                collection.bulk_write(operations, ordered=False)
+                return
+            except BulkWriteError as e:
+                # Duplicate keys are writes that the failed attempt had already applied.
+                for failed in e.details['writeErrors']:
+                    if failed.get('code') != DUPLICATE_KEY:
+                        print(f"!!! WRITE BUFFER: write rejected by {collection.full_name}: {failed.get('errmsg')} !!!")
+                return
+            except PyMongoError as e:
+                error = e
+        if operations:
+            print(f"!!! WRITE BUFFER: dropped {len(operations)} writes to {collection.full_name} after {self.max_retries} attempts: {error} !!!")
+
+    @staticmethod
+    def _notify(batch):
+        for _, _, on_written, _ in batch:
+            if on_written is None:
+                continue
+            try:
+                on_written()
+            except Exception as e:
+                print(f"!!! WRITE BUFFER: on_written callback failed: {e} !!!")
@@ -0,0 +1,40 @@
+# wsgi.py
+# Production entry point. Run the app under a multi-process WSGI server, for example:
+#
+#   flask --app app init-db                     # once per deploy: indexes and sample users
+#   gunicorn -c gunicorn.conf.py wsgi:application
+#
+# gunicorn.conf.py starts WEB_CONCURRENCY worker processes (default: 2 per CPU core), each
+# with GUNICORN_THREADS threads. Importing this module does not touch MongoDB, so the app
+# can be preloaded in the master process: every worker builds its own MongoClient and its
+# own background threads/pools on first use after the fork. Size MONGO_MAX_POOL_SIZE to
+# the threads per worker plus a few for background work; the total connection count is
+# roughly workers × MONGO_MAX_POOL_SIZE.
+#
+# On Windows, where gunicorn is unavailable, `waitress-serve --threads 16 wsgi:application`
+# serves the same app from a single process.
+#
+# Orchestrators should probe /healthz for liveness and /readyz (pings MongoDB) for readiness.
+#
+# State that must be shared between worker processes:
+#   - In-progress interviews (INTERVIEW_STORE) and compiler job results (EXEC_JOB_STORE)
+#     default to MongoDB here (collections interview_sessions and compiler_jobs, both with
+#     TTL indexes), since the next request or poll may reach a different worker. 'memory'
+#     only works with one process, and gunicorn.conf.py refuses to start more than one
+#     worker with it. INTERVIEW_STORE=redis is also shared.
+#
+# State that stays per process (acceptable, but size the settings for it):
+#   - Login throttling (LOGIN_MAX_PER_IP, LOGIN_MAX_FAILURES) is counted per worker, so the
+#     effective limit is roughly workers × the configured value; divide accordingly.
+#   - The compiler rate limit (EXEC_RATE_LIMIT) and result cache are per worker as well.
+#   - Cached student dashboards are invalidated only in the worker that flushed the write;
+#     other workers may serve a dashboard up to DASHBOARD_CACHE_TTL seconds old.
+
+import os
+
+os.environ.setdefault('INTERVIEW_STORE', 'mongo')
+os.environ.setdefault('EXEC_JOB_STORE', 'mongo')
+
+from app import create_app  # noqa: E402  (the stores are chosen at import)
+
+application = create_app()